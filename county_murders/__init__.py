@@ -0,0 +1,6 @@
+"""
+================================================================================
+COUNTY MURDERS - SHARED PIPELINE CODE
+Helpers used by county_murders_analysis.py and create_visualizations.py
+================================================================================
+"""
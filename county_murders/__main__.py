@@ -0,0 +1,5 @@
+"""``python -m county_murders <command>`` - see cli.py."""
+
+from county_murders.cli import main
+
+main()
@@ -0,0 +1,222 @@
+"""
+The analysis steps of county_murders_analysis.py as importable functions.
+
+Each function takes the raw or cleaned table and returns plain pandas
+objects (or a dict of them), so a caller can run a single step without
+the rest of the pipeline.  scikit-learn and SciPy are imported lazily by
+the steps that use them (STEP 5-7); descriptive statistics only need
+pandas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import aggregate
+from county_murders.artifacts import fit_elbow, fit_kmeans, fit_pca, fit_scaler
+from county_murders.decomposition import SOLVERS, frame_chunks, streaming_pca
+from county_murders.lazy import lazy_import
+from county_murders.online import comoments
+from county_murders.resampling import bootstrap, permutation_test
+
+stats = lazy_import('scipy.stats')
+
+# Variables used by the correlation, clustering and PCA steps
+KEY_VARS = ['murders', 'murdrate', 'arrests', 'arrestrate', 'popul',
+            'density', 'percblack', 'rpcunemins', 'rpcpersinc']
+CLUSTER_VARS = ['murdrate', 'arrestrate', 'density', 'rpcunemins', 'percblack']
+PCA_VARS = ['murders', 'murdrate', 'arrests', 'arrestrate', 'popul',
+            'density', 'percblack', 'percmale', 'rpcunemins', 'rpcpersinc']
+
+# Columns aggregated per key by summaries(): everything the STEP 3 tables
+# and figures 1, 6 and 11 need
+SUMMARY_SPEC = {
+    'year': ['murders', 'arrests'],
+    'statefips': ['murders', 'murdrate', 'popul'],
+    'countyid': ['murders'],
+}
+
+
+# STEP 1: DATA LOADING AND EXPLORATION
+
+def missing_values(df):
+    """Missing count and percentage for the columns that have any."""
+    missing = df.isnull().sum()
+    missing_pct = (missing / len(df)) * 100
+    missing_df = pd.DataFrame({'Missing Count': missing, 'Percentage': missing_pct})
+    return missing_df[missing_df['Missing Count'] > 0]
+
+
+# STEP 2: DATA PREPROCESSING
+
+def numerical_columns(df_clean):
+    return df_clean.select_dtypes(include=[np.number]).columns.tolist()
+
+
+# STEP 3: EXPLORATORY DATA ANALYSIS
+
+def murder_statistics(df_clean):
+    """Total, mean and max murders and the number of zero-murder rows."""
+    murders = df_clean['murders']
+    return {
+        'total': murders.sum(),
+        'mean': murders.mean(),
+        'max': murders.max(),
+        'zero_count': (murders == 0).sum(),
+    }
+
+
+def summaries(df_clean, spec=SUMMARY_SPEC):
+    """Year, state and county aggregates in one pass per key (see aggregate.py)."""
+    return aggregate(df_clean, spec)
+
+
+def yearly_trends(df_clean, agg=None):
+    agg = summaries(df_clean, {'year': ['murders']}) if agg is None else agg
+    return agg['year'].agg('murders', ['sum', 'mean', 'std'])
+
+
+def state_summary(df_clean, agg=None):
+    agg = summaries(df_clean, {'statefips': SUMMARY_SPEC['statefips']}) if agg is None else agg
+    return agg['statefips'].agg({
+        'murders': 'sum',
+        'murdrate': 'mean',
+        'popul': 'mean'
+    }).round(2)
+
+
+# STEP 4: CORRELATION ANALYSIS
+
+def correlations(df_clean, variables=KEY_VARS, moments=None):
+    """Pearson matrix of ``variables`` from a co-moment accumulator.
+
+    ``moments`` (an online.CoMoments over a superset of ``variables``) is
+    computed from ``df_clean`` when not given, so callers that need
+    several matrices - STEP 4 and the figure 3 heatmap - can share one
+    (see correlation_moments()).
+    """
+    if moments is None:
+        moments = comoments(df_clean, variables)
+    return moments.corr(variables)
+
+
+def correlation_moments(df_clean):
+    """CoMoments over PCA_VARS, which covers KEY_VARS: the accumulator
+    STEP 4 (KEY_VARS) and the figure 3 heatmap (PCA_VARS) both read."""
+    return comoments(df_clean, PCA_VARS)
+
+
+# STEP 5: K-MEANS CLUSTERING
+
+def cluster(df_clean, variables=CLUSTER_VARS, n_clusters=4, k_values=range(2, 11),
+            n_init=10, random_state=42):
+    """Elbow sweep plus the final KMeans fit (shared via the artifact store).
+
+    Returns a dict with ``X_cluster`` (features plus a ``Cluster``
+    column), ``X_scaled``, ``scaler``, ``kmeans``, ``elbow`` (the sweep
+    table, or None when ``k_values`` is None) and ``summary`` (per-cluster
+    feature means).
+    """
+    X_cluster = df_clean[variables].dropna()
+    scaler, X_scaled = fit_scaler(X_cluster)
+    elbow = None
+    if k_values is not None:
+        elbow = fit_elbow(X_scaled, k_values, n_init=n_init, random_state=random_state)
+    kmeans, clusters = fit_kmeans(X_scaled, n_clusters=n_clusters,
+                                  random_state=random_state, n_init=n_init)
+    X_cluster = X_cluster.assign(Cluster=clusters)
+    return {
+        'X_cluster': X_cluster,
+        'X_scaled': X_scaled,
+        'scaler': scaler,
+        'kmeans': kmeans,
+        'elbow': elbow,
+        'summary': X_cluster.groupby('Cluster')[list(variables)].mean(),
+    }
+
+
+# STEP 6: PRINCIPAL COMPONENT ANALYSIS (PCA)
+
+def pca_summary(pca, variables, n_loadings=3, components=None):
+    """Explained/cumulative variance ratios and top loadings of a fitted PCA."""
+    explained = pca.explained_variance_ratio_
+    n_loadings = min(n_loadings, len(explained))
+    loadings = pd.DataFrame(
+        pca.components_[:n_loadings].T,
+        columns=[f'PC{i}' for i in range(1, n_loadings + 1)],
+        index=variables
+    )
+    return {
+        'pca': pca,
+        'components': components,
+        'explained': explained,
+        'cumulative': np.cumsum(explained),
+        'loadings': loadings,
+    }
+
+
+def pca_analysis(df_clean, variables=PCA_VARS, n_loadings=3, solver='full', n_components=None,
+                 random_state=42):
+    """PCA on the standardized variables.
+
+    ``solver`` is ``'full'`` (exact, all components), ``'randomized'``
+    (truncated randomized SVD of ``n_components``, default 5) or
+    ``'incremental'`` (IncrementalPCA over row chunks); see
+    decomposition.py.  Returns a dict with ``pca``, ``components``,
+    ``explained`` and ``cumulative`` variance ratios and the top
+    ``loadings``.
+    """
+    X_pca = df_clean[variables].dropna()
+    if solver == 'incremental':
+        scaler, pca = streaming_pca(frame_chunks(X_pca), variables, n_components)
+        return pca_summary(pca, variables, n_loadings, pca.transform(scaler.transform(X_pca)))
+    _, X_pca_scaled = fit_scaler(X_pca)
+    if solver == 'randomized':
+        pca, components = fit_pca(X_pca_scaled, n_components or 5, svd_solver='randomized',
+                                  random_state=random_state)
+    elif solver == 'full':
+        pca, components = fit_pca(X_pca_scaled, n_components)
+    else:
+        raise ValueError(f"unknown PCA solver {solver!r}; expected one of {SOLVERS}")
+    return pca_summary(pca, variables, n_loadings, components)
+
+
+# STEP 7: STATISTICAL TESTING
+
+def statistical_tests(df_clean, split_year=1988):
+    """Pre/post ``split_year`` t-test on murdrate and unemployment correlation."""
+    pre = df_clean[df_clean['year'] < split_year]['murdrate']
+    post = df_clean[df_clean['year'] >= split_year]['murdrate']
+    t_stat, p_value = stats.ttest_ind(pre, post)
+    corr_coef, corr_pval = stats.pearsonr(df_clean['rpcunemins'], df_clean['murdrate'])
+    return {
+        'pre_mean': pre.mean(),
+        'post_mean': post.mean(),
+        't_stat': t_stat,
+        'p_value': p_value,
+        'corr_coef': corr_coef,
+        'corr_pval': corr_pval,
+    }
+
+
+def resampled_tests(df_clean, split_year=1988, n_resamples=2000, by_county=True, seed=42,
+                    n_jobs=None):
+    """Bootstrap intervals and permutation p-values for the STEP 7 tests.
+
+    The pre/post ``split_year`` difference of mean murdrate and the
+    unemployment-murdrate correlation, resampling whole counties unless
+    ``by_county`` is False (see resampling.py).  Returns a dict with
+    ``'mean_diff'`` and ``'corr'``, each holding the observed statistic,
+    its 95% interval (``low``, ``high``) and the permutation ``p_value``.
+    """
+    df = df_clean.sort_values(['countyid', 'year'], kind='stable')
+    blocks = df['countyid'].to_numpy() if by_county else None
+    rate = df['murdrate'].to_numpy(dtype=np.float64)
+    options = dict(blocks=blocks, n_resamples=n_resamples, seed=seed, n_jobs=n_jobs)
+    results = {}
+    for name, x, y in [('mean_diff', rate, (df['year'] < split_year).to_numpy()),
+                       ('corr', df['rpcunemins'].to_numpy(dtype=np.float64), rate)]:
+        boot = bootstrap(x, y, name, **options)
+        test = permutation_test(x, y, name, **options)
+        results[name] = {'statistic': boot['statistic'], 'low': boot['low'],
+                         'high': boot['high'], 'se': boot['se'], 'p_value': test['p_value']}
+    return results
@@ -0,0 +1,116 @@
+"""
+Persisted model artifacts shared by the analysis and visualization scripts.
+
+Both scripts fit the same StandardScaler, KMeans(n_clusters=4), PCA and
+elbow sweep on the same columns.  Each fit here is stored under
+
+    <cache_dir>/artifacts/<name>-<key>.joblib
+
+where ``key`` hashes the input matrix (values, column names, dtypes),
+the hyperparameters and the scikit-learn version.  Whichever script runs
+first pays for the fit; the other one loads the fitted object and the
+transformed matrix.  A changed input or parameter produces a new key, so
+stale entries are simply never read again.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from county_murders.clustering import SILHOUETTE_SAMPLE, elbow_sweep
+from county_murders.data import get_cache_dir
+from county_murders.lazy import lazy_import
+
+# scikit-learn and joblib are only imported once a model is fitted or loaded
+joblib = lazy_import('joblib')
+sklearn = lazy_import('sklearn')
+sk_cluster = lazy_import('sklearn.cluster')
+sk_decomposition = lazy_import('sklearn.decomposition')
+sk_preprocessing = lazy_import('sklearn.preprocessing')
+
+
+def fingerprint(X):
+    """Content hash of a DataFrame or array."""
+    h = hashlib.sha256()
+    if isinstance(X, pd.DataFrame):
+        h.update(json.dumps([[str(c), str(t)] for c, t in X.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(X, index=True).values.tobytes())
+    else:
+        X = np.ascontiguousarray(X)
+        h.update(f'{X.dtype.str}{X.shape}'.encode())
+        h.update(X.tobytes())
+    return h.hexdigest()
+
+
+def artifact_key(name, X, params):
+    """Key for a fit of ``name`` with ``params`` on ``X``."""
+    payload = json.dumps({'name': name, 'data': fingerprint(X), 'params': params,
+                          'sklearn': sklearn.__version__}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def cached(name, X, params, fit, cache_dir=None):
+    """Return ``fit()``, loading it from the artifact store when possible."""
+    path = os.path.join(get_cache_dir(cache_dir), 'artifacts',
+                        f'{name}-{artifact_key(name, X, params)}.joblib')
+    if os.path.exists(path):
+        try:
+            return joblib.load(path)
+        except Exception:
+            pass  # unreadable entry (e.g. interrupted write): refit below
+
+    result = fit()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    os.close(fd)
+    joblib.dump(result, tmp)
+    os.replace(tmp, path)
+    return result
+
+
+def fit_scaler(X, cache_dir=None):
+    """StandardScaler fitted on ``X``; returns ``(scaler, X_scaled)``."""
+    def fit():
+        scaler = sk_preprocessing.StandardScaler()
+        return scaler, scaler.fit_transform(X)
+    return cached('scaler', X, {}, fit, cache_dir)
+
+
+def fit_kmeans(X_scaled, n_clusters=4, random_state=42, n_init=10, cache_dir=None):
+    """KMeans fitted on ``X_scaled``; returns ``(kmeans, labels)``."""
+    params = {'n_clusters': n_clusters, 'random_state': random_state, 'n_init': n_init}
+
+    def fit():
+        kmeans = sk_cluster.KMeans(**params)
+        return kmeans, kmeans.fit_predict(X_scaled)
+    return cached('kmeans', X_scaled, params, fit, cache_dir)
+
+
+def fit_pca(X_scaled, n_components=None, svd_solver='auto', random_state=None, cache_dir=None):
+    """PCA fitted on ``X_scaled``; returns ``(pca, components)``.
+
+    ``svd_solver='randomized'`` with a small ``n_components`` computes
+    only the leading components (see decomposition.py).
+    """
+    params = {'n_components': n_components}
+    if svd_solver != 'auto':
+        # (default fits keep the keys they were stored under)
+        params.update(svd_solver=svd_solver, random_state=random_state)
+
+    def fit():
+        pca = sk_decomposition.PCA(**params)
+        return pca, pca.fit_transform(X_scaled)
+    return cached('pca', X_scaled, params, fit, cache_dir)
+
+
+def fit_elbow(X_scaled, k_values=range(2, 11), n_init=10, random_state=42, n_jobs=None,
+              silhouette_sample=SILHOUETTE_SAMPLE, cache_dir=None):
+    """Elbow sweep table (see clustering.elbow_sweep) for ``X_scaled``."""
+    params = {'k_values': list(k_values), 'n_init': n_init, 'random_state': random_state,
+              'silhouette_sample': silhouette_sample}
+    return cached('elbow', X_scaled, params,
+                  lambda: elbow_sweep(X_scaled, n_jobs=n_jobs, **params), cache_dir)
@@ -0,0 +1,206 @@
+"""
+Scaling benchmarks for the pipeline stages on synthetic panels.
+
+For every panel size a synthetic CSV is generated (synthetic.py) and each
+existing stage is timed and memory-profiled in turn: CSV load, dropna,
+the groupby summaries, correlation, KMeans, the elbow sweep, PCA, the
+STEP 7 tests and every figure.  Results are written as JSON so a later
+run can be compared against a saved baseline with compare().
+
+Stages are measured with instrument.measure().  Peak allocations come
+from tracemalloc, which slows down allocation-heavy code (matplotlib
+especially).  Pass ``trace_memory=False`` for clean timings with only the
+RSS delta.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import stats
+from sklearn.cluster import KMeans
+from sklearn.decomposition import PCA
+from sklearn.preprocessing import StandardScaler
+
+from county_murders import analysis, schema, synthetic
+from county_murders.analysis import CLUSTER_VARS, PCA_VARS
+from county_murders.clustering import elbow_sweep
+from county_murders.decomposition import frame_chunks, streaming_pca
+from county_murders.figures import FIGURES, build_figure_data, render_figures
+from county_murders.instrument import measure
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Cold-start import sets timed by import_times(): the library entry point,
+# the eager imports county_murders_analysis.py used to start with, and
+# pandas alone as the floor
+IMPORT_SETS = {
+    'county_murders.analysis': ['county_murders.analysis'],
+    'eager (pre-library)': ['pandas', 'numpy', 'matplotlib.pyplot', 'seaborn', 'scipy.stats',
+                            'sklearn.cluster', 'sklearn.decomposition',
+                            'sklearn.preprocessing'],
+    'pandas': ['pandas'],
+}
+
+
+def _groupby(df):
+    agg = analysis.summaries(df)
+    return (analysis.yearly_trends(df, agg), analysis.state_summary(df, agg),
+            agg['countyid'].sum('murders').nlargest(10))
+
+
+def _kmeans(df):
+    X = StandardScaler().fit_transform(df[CLUSTER_VARS])
+    return KMeans(n_clusters=4, random_state=42, n_init=10).fit_predict(X)
+
+
+def _pca(df):
+    return PCA().fit(StandardScaler().fit_transform(df[PCA_VARS]))
+
+
+def _pca_randomized(df):
+    return PCA(n_components=3, svd_solver='randomized', random_state=42).fit(
+        StandardScaler().fit_transform(df[PCA_VARS]))
+
+
+def _pca_incremental(df):
+    return streaming_pca(frame_chunks(df), PCA_VARS, n_components=3)
+
+
+def _ttest(df):
+    pre = df.loc[df['year'] < 1988, 'murdrate']
+    post = df.loc[df['year'] >= 1988, 'murdrate']
+    return stats.ttest_ind(pre, post), stats.pearsonr(df['rpcunemins'], df['murdrate'])
+
+
+STAGES = ['load', 'dropna', 'groupby', 'correlation', 'kmeans', 'elbow', 'pca', 'pca_randomized',
+          'pca_incremental', 'ttest'] \
+    + [f'figure:{name}' for name in FIGURES]
+
+
+def run_size(n_rows, stages=None, seed=0, elbow_n_init=10, workdir=None, trace_memory=True):
+    """Benchmark the selected stages on one synthetic panel size."""
+    stages = STAGES if stages is None else stages
+    rows = []
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        csv = synthetic.write_panel_csv(os.path.join(tmp, 'panel.csv'), n_rows, seed=seed)
+
+        def record(stage, func, *args):
+            result, metrics = measure(func, *args, trace_memory=trace_memory)
+            rows.append(dict(rows=n_rows, stage=stage, **metrics))
+            return result
+
+        # load and dropna are always needed as inputs for the later stages
+        df = record('load', schema.read_csv, csv) if 'load' in stages else schema.read_csv(csv)
+        df_clean = record('dropna', df.dropna) if 'dropna' in stages else df.dropna()
+        del df
+
+        simple = {
+            'groupby': _groupby,
+            'correlation': analysis.correlations,
+            'kmeans': _kmeans,
+            'elbow': lambda d: elbow_sweep(StandardScaler().fit_transform(d[CLUSTER_VARS]),
+                                           n_init=elbow_n_init),
+            'pca': _pca,
+            'pca_randomized': _pca_randomized,
+            'pca_incremental': _pca_incremental,
+            'ttest': _ttest,
+        }
+        for stage, func in simple.items():
+            if stage in stages:
+                record(stage, func, df_clean)
+
+        figures = [s.split(':', 1)[1] for s in stages if s.startswith('figure:')]
+        if figures:
+            # Inputs are prepared untimed with a private artifact store
+            figure_data = build_figure_data(df_clean, cache_dir=os.path.join(tmp, 'cache'))
+            for name in figures:
+                record(f'figure:{name}', render_figures, {name: figure_data[name]},
+                       os.path.join(tmp, 'figures'), 300, 1, True)
+    return rows
+
+
+def import_times(import_sets=None, repeat=3):
+    """
+    Time cold-start imports, each in a fresh interpreter.
+
+    Parameters
+    ----------
+    import_sets : dict, optional
+        Label -> list of module names (default: IMPORT_SETS).
+    repeat : int
+        Interpreters started per set; the fastest run is reported.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Indexed by label with the best and median import time in seconds.
+    """
+    import_sets = IMPORT_SETS if import_sets is None else import_sets
+    rows = []
+    for label, modules in import_sets.items():
+        code = ('import time; start = time.perf_counter(); '
+                + '; '.join(f'import {m}' for m in modules)
+                + '; print(time.perf_counter() - start)')
+        runs = [float(subprocess.run([sys.executable, '-c', code], check=True,
+                                     capture_output=True, text=True).stdout)
+                for _ in range(repeat)]
+        rows.append(dict(imports=label, best_s=min(runs), median_s=float(np.median(runs))))
+    return pd.DataFrame(rows).set_index('imports')
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=None, seed=0, elbow_n_init=10, workdir=None,
+                   trace_memory=True, progress=print):
+    """Benchmark every size; returns a JSON-serialisable report."""
+    results = []
+    for n_rows in sizes:
+        for row in run_size(n_rows, stages, seed, elbow_n_init, workdir, trace_memory):
+            results.append(row)
+            if progress:
+                peak = row['peak_traced_mb']
+                progress(f"{row['rows']:>10,} rows  {row['stage']:<40} {row['wall_s']:9.3f}s"
+                         + (f"  peak {peak:9.1f} MB" if peak is not None else ""))
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'seed': seed,
+            'elbow_n_init': elbow_n_init,
+            'trace_memory': trace_memory,
+        },
+        'results': results,
+    }
+
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, metric='wall_s'):
+    """Table of ``metric`` per (rows, stage) for two reports and their ratio."""
+    def frame(report):
+        return pd.DataFrame(report['results']).set_index(['rows', 'stage'])[metric]
+
+    table = pd.DataFrame({'baseline': frame(baseline), 'current': frame(current)}).dropna()
+    table['ratio'] = table['current'] / table['baseline']
+    return table
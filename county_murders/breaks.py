@@ -0,0 +1,126 @@
+"""
+Structural-break scan over candidate split years.
+
+STEP 7 compares murder rates before and after a hard-coded 1988.
+scan_breaks() evaluates every candidate year at once: it aggregates each
+metric by year in a single pass (aggregate.group_stats), takes prefix
+sums of the yearly counts, (shifted) sums and sums of squares, and reads
+the two-sample t statistic of "year < b" against "year >= b" for every
+candidate ``b`` off those prefix sums - O(1) per candidate and metric
+instead of re-filtering the table:
+
+    scan = break_scan(df_clean, ['murdrate', 'murders'])
+    scan['curve'].loc['murdrate']         # t and p-value for 1981..1995
+    scan['best']                          # largest |t| per metric
+
+With ``equal_var=True`` the statistic and p-value at each candidate equal
+``scipy.stats.ttest_ind(pre, post)`` (Welch's test otherwise).  The
+p-values are per candidate: the best break of a scan is chosen after
+looking at all of them, so its nominal p-value overstates the evidence
+(a sup-t statistic needs a permutation or Andrews-type reference
+distribution).
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import group_stats
+from county_murders.lazy import lazy_import
+
+stats = lazy_import('scipy.stats')
+
+METRICS = ['murdrate', 'murders', 'arrestrate', 'rpcunemins']
+
+
+def _prefix(values):
+    """Cumulative sums over years with a leading zero row: ``_prefix(v)[i] == v[:i].sum(0)``."""
+    return np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+
+
+def _prefix_moments(year_stats, metrics, years):
+    """Prefix counts, shifted sums and shifted sums of squares (years x metrics)."""
+    positions = [year_stats.columns.index(metric) for metric in metrics]
+    rows = pd.Index(year_stats.index).get_indexer(years)
+    present = (rows >= 0)[:, None]
+
+    def yearly(values):
+        return np.where(present, values[rows][:, positions], 0.0)
+    n, total, m2 = yearly(year_stats.counts), yearly(year_stats.sums), yearly(year_stats.m2)
+    # Centre on the overall means so the squares below do not cancel
+    shift = total.sum(axis=0) / n.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(n > 0, total / n - shift, 0.0)
+    return _prefix(n), _prefix(n * offset), _prefix(m2 + n * offset ** 2), shift
+
+
+def scan_breaks(year_stats, metrics, candidates, equal_var=True):
+    """t statistics of every candidate break from per-year GroupStats.
+
+    Parameters
+    ----------
+    year_stats : GroupStats
+        group_stats(df, 'year', metrics).
+    metrics : list of str
+    candidates : array-like of int
+        Break years ``b``; "pre" is ``year < b``.
+    equal_var : bool
+        Pooled-variance t test (as ``ttest_ind``) or Welch's test.
+
+    Returns
+    -------
+    DataFrame indexed by (metric, year) with n_pre, n_post, pre_mean,
+    post_mean, t_stat, df and p_value.
+    """
+    metrics = list(metrics)
+    candidates = np.asarray(candidates, dtype=np.int64)
+    years = np.arange(int(year_stats.index.min()), int(year_stats.index.max()) + 1)
+    cut = np.clip(candidates - years[0], 0, len(years))
+    # Every array below is candidates x metrics
+    n, s1, s2, shift = _prefix_moments(year_stats, metrics, years)
+    n1, n2 = n[cut], n[-1] - n[cut]
+    t1, t2 = s1[cut], s1[-1] - s1[cut]
+    q1, q2 = s2[cut], s2[-1] - s2[cut]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean1, mean2 = t1 / n1, t2 / n2
+        ss1 = np.maximum(q1 - t1 * mean1, 0.0)
+        ss2 = np.maximum(q2 - t2 * mean2, 0.0)
+        if equal_var:
+            dof = n1 + n2 - 2
+            se = np.sqrt((ss1 + ss2) / dof * (1 / n1 + 1 / n2))
+        else:
+            v1, v2 = ss1 / (n1 - 1) / n1, ss2 / (n2 - 1) / n2
+            se = np.sqrt(v1 + v2)
+            dof = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+        t_stat = (mean1 - mean2) / se
+    columns = {
+        'n_pre': n1.astype(np.int64), 'n_post': n2.astype(np.int64),
+        'pre_mean': mean1 + shift, 'post_mean': mean2 + shift,
+        't_stat': t_stat, 'df': dof,
+        'p_value': 2 * stats.t.sf(np.abs(t_stat), dof),
+    }
+    # Metric-major rows: transpose before flattening
+    index = pd.MultiIndex.from_product([metrics, candidates], names=['metric', 'year'])
+    return pd.DataFrame({name: values.T.ravel() for name, values in columns.items()}, index=index)
+
+
+def break_scan(df_clean, metrics=METRICS, candidates=None, equal_var=True):
+    """Scan every candidate break year for each metric (see scan_breaks()).
+
+    ``candidates`` default to the interior years of the panel (1981-1995
+    for 1980-1996), so both sides always span at least one year.
+
+    Returns
+    -------
+    dict with the ``curve`` (scan_breaks() table) and the ``best`` row per
+    metric (largest ``|t|``), indexed by metric with the break year as a
+    column.
+    """
+    metrics = list(metrics)
+    year_stats = group_stats(df_clean, 'year', metrics)
+    if candidates is None:
+        candidates = np.arange(int(year_stats.index.min()) + 1, int(year_stats.index.max()))
+    curve = scan_breaks(year_stats, metrics, candidates, equal_var)
+    strength = curve['t_stat'].abs().fillna(-1.0)
+    best = curve.loc[strength.groupby(level='metric', sort=False).idxmax()]
+    best = best.reset_index(level='year').rename(columns={'year': 'break_year'})
+    return {'curve': curve, 'best': best}
@@ -0,0 +1,515 @@
+"""
+Stage-selective command-line entry point.
+
+    python -m county_murders describe [--stream] # STEP 1: shape, describe(), missing values
+    python -m county_murders trends              # STEP 3: murder totals, by year, by state
+    python -m county_murders correlate [--stream] # STEP 4: correlation with a target
+    python -m county_murders correlate --tests [--by year] [--all-columns]
+    python -m county_murders cluster [--no-elbow] [--stream]
+    python -m county_murders pca [--solver randomized|incremental] [--compare]
+    python -m county_murders ttest [--split-year 1988] [--resample 2000]
+    python -m county_murders breaks [--metrics murdrate murders] [--curve]
+    python -m county_murders viz [FIGURE ...] [--force]
+    python -m county_murders sql [N ...] [--engine sqlite]
+    python -m county_murders rollup --by statefips year --measure murders --cumulative
+    python -m county_murders sketch --by year --column murdrate --positive
+    python -m county_murders top --metric murders --k 10 [--by year]
+    python -m county_murders panel 1001 6037 --metric murders --diff
+
+Each subcommand runs only its own stage.  Inputs come from the caches
+the scripts already share: the downloaded CSV and its Arrow snapshot
+(data.py) - only the columns a stage needs are read - and the fitted
+scaler/KMeans/PCA/elbow models (artifacts.py) - and ``rollup`` answers
+from the cached aggregate cube (cube.py); ``sketch`` streams the CSV
+chunks into mergeable quantile/distinct sketches (sketches.py) and
+``top`` into exact top-k accumulators (topk.py); ``panel`` shows county
+series from the dense county x year arrays (panel.py).  Heavy libraries are
+imported by the subcommands that use them, so e.g. ``pca`` after a full
+run costs well under the time of county_murders_analysis.py.
+"""
+
+import argparse
+
+import pandas as pd
+
+from county_murders import analysis
+from county_murders.data import DATA_URL, iter_chunks, load_clean, load_raw
+
+
+def _banner(title):
+    print("="*80)
+    print(title)
+    print("="*80)
+
+
+def _load(args, columns=None):
+    return load_clean(args.source, refresh=args.refresh, columns=columns)
+
+
+def cmd_describe_stream(args):
+    from county_murders.online import stream_describe
+
+    raw, clean = stream_describe(args.source, chunksize=args.chunksize)
+    _banner(f"DESCRIPTIVE STATISTICS (streamed in chunks of {args.chunksize} rows)")
+    print(f"Records: {raw.rows} ({clean.rows} without missing values)")
+    print(raw.describe())
+    print("\n" + "="*80)
+    print("MISSING VALUES CHECK")
+    print("="*80)
+    print(raw.missing_values())
+    murder_stats = clean.murder_statistics()
+    print("\n" + "="*80)
+    print("MURDER STATISTICS")
+    print("="*80)
+    print(f"Total Murders (1980-1996): {murder_stats['total']:.0f}")
+    print(f"Average Murders per County: {murder_stats['mean']:.2f}")
+    print(f"Maximum Murders in a County: {murder_stats['max']:.0f}")
+    print(f"Counties with Zero Murders: {murder_stats['zero_count']}")
+
+
+def cmd_describe(args):
+    from county_murders.schema import memory_report
+
+    if args.stream:
+        return cmd_describe_stream(args)
+    df = load_raw(args.source, refresh=args.refresh)
+    _banner("DATASET OVERVIEW")
+    print(f"Dataset Shape: {df.shape}")
+    print(df.head(10))
+    mem = memory_report(df)
+    print(f"\nMemory: {mem.loc['TOTAL', 'compact_bytes'] / 1024**2:.2f} MB "
+          f"({mem.loc['TOTAL', 'ratio']:.1f}x smaller than default dtypes)")
+    print("\n" + "="*80)
+    print("DESCRIPTIVE STATISTICS")
+    print("="*80)
+    print(df.describe())
+    print("\n" + "="*80)
+    print("MISSING VALUES CHECK")
+    print("="*80)
+    print(analysis.missing_values(df))
+
+
+def cmd_trends(args):
+    df_clean = _load(args, ['year', 'statefips', 'murders', 'murdrate', 'popul'])
+    murder_stats = analysis.murder_statistics(df_clean)
+    _banner("MURDER STATISTICS")
+    print(f"Total Murders (1980-1996): {murder_stats['total']:.0f}")
+    print(f"Average Murders per County: {murder_stats['mean']:.2f}")
+    print(f"Maximum Murders in a County: {murder_stats['max']:.0f}")
+    print(f"Counties with Zero Murders: {murder_stats['zero_count']}")
+    agg = analysis.summaries(df_clean, {'year': ['murders'],
+                                        'statefips': analysis.SUMMARY_SPEC['statefips']})
+    print("\nYEAR-WISE MURDER TRENDS:")
+    print(analysis.yearly_trends(df_clean, agg))
+    print("\nSTATE-WISE ANALYSIS:")
+    print(analysis.state_summary(df_clean, agg).head(args.top))
+
+
+def cmd_correlation_tests(args):
+    from county_murders.significance import correlation_tests
+
+    df_clean = _load(args)
+    if args.all_columns:
+        variables = [c for c in df_clean.select_dtypes('number').columns if c != args.by]
+    else:
+        variables = list(dict.fromkeys(analysis.KEY_VARS + [args.target]))
+    tests = correlation_tests(df_clean, variables, by=args.by, family=args.family)
+    significant = tests[tests['q_value'] < args.alpha]
+    _banner(f"PAIRWISE CORRELATION TESTS ({len(variables)} variables"
+            + (f", by {args.by}" if args.by else "") + ")")
+    print(f"Pairs tested: {tests['p_value'].notna().sum()}; significant at "
+          f"FDR {args.alpha}: {len(significant)} (Benjamini-Hochberg, family={args.family})")
+    print(significant.sort_values('p_value').head(args.rows).round(4))
+
+
+def cmd_correlate(args):
+    if args.tests:
+        return cmd_correlation_tests(args)
+    variables = list(dict.fromkeys(analysis.KEY_VARS + [args.target]))
+    if args.stream:
+        from county_murders.online import stream_correlations
+
+        moments = stream_correlations(variables, args.source, chunksize=args.chunksize)
+        correlation_matrix = moments.corr()
+    else:
+        correlation_matrix = analysis.correlations(_load(args, variables), variables)
+    _banner(f"CORRELATION WITH {args.target.upper()}")
+    print(correlation_matrix[args.target].sort_values(ascending=False))
+
+
+def cmd_cluster_stream(args):
+    from county_murders import clustering
+
+    # Out of core: a scaler pass, --epochs MiniBatchKMeans passes and a
+    # labelling pass over the CSV chunks, never the whole matrix
+    def read_chunks():
+        return iter_chunks(args.source, chunksize=args.chunksize, columns=analysis.CLUSTER_VARS)
+
+    scaler, model, sample = clustering.streaming_kmeans(
+        read_chunks, analysis.CLUSTER_VARS, n_clusters=args.k, n_epochs=args.epochs,
+        sample_size=args.sample)
+    counts, means = clustering.streaming_cluster_summary(read_chunks, analysis.CLUSTER_VARS,
+                                                         scaler, model)
+    _banner(f"K-MEANS CLUSTERING (mini-batch, streamed in chunks of {args.chunksize} rows)")
+    print(f"Cluster Distribution (k={args.k}):")
+    print(counts)
+    print("\nCluster Characteristics:")
+    print(means)
+    print(f"\nAgreement with a full-batch fit on a {len(sample)}-row sample:")
+    for key, value in clustering.compare_with_full_batch(scaler, model, sample).items():
+        print(f"  {key}: {value:.4g}")
+
+
+def cmd_cluster(args):
+    if args.stream:
+        return cmd_cluster_stream(args)
+    k_values = None if args.no_elbow else range(2, 11)
+    clustering = analysis.cluster(_load(args, analysis.CLUSTER_VARS),
+                                  n_clusters=args.k, k_values=k_values)
+    _banner("K-MEANS CLUSTERING")
+    if clustering['elbow'] is not None:
+        print("Elbow Sweep (cluster quality by K):")
+        print(clustering['elbow'].round(4))
+    print(f"\nCluster Distribution (k={args.k}):")
+    print(clustering['X_cluster']['Cluster'].value_counts().sort_index())
+    print("\nCluster Characteristics:")
+    print(clustering['summary'])
+
+
+def cmd_pca(args):
+    from county_murders import decomposition
+
+    if args.solver == 'incremental':
+        # Out of core: two passes over the CSV chunks, never the whole matrix
+        _, pca = decomposition.streaming_pca(
+            lambda: iter_chunks(args.source, chunksize=args.chunksize, columns=analysis.PCA_VARS),
+            analysis.PCA_VARS, args.components)
+        pca_result = analysis.pca_summary(pca, analysis.PCA_VARS, args.loadings)
+    else:
+        pca_result = analysis.pca_analysis(_load(args, analysis.PCA_VARS), n_loadings=args.loadings,
+                                           solver=args.solver, n_components=args.components)
+    _banner(f"PRINCIPAL COMPONENT ANALYSIS (PCA, {args.solver} solver)")
+    print("Explained Variance by Each Component:")
+    for i, (var, cum_var) in enumerate(zip(pca_result['explained'], pca_result['cumulative']), 1):
+        print(f"PC{i}: {var*100:.2f}% (Cumulative: {cum_var*100:.2f}%)")
+    print(f"\nPrincipal Component Loadings (Top {args.loadings}):")
+    print(pca_result['loadings'])
+    if args.compare and args.solver != 'full':
+        exact = analysis.pca_analysis(_load(args, analysis.PCA_VARS))['pca']
+        print("\nAgreement with the exact solver:")
+        for key, value in decomposition.compare_pca(exact, pca_result['pca']).items():
+            print(f"  {key}: {value:.3g}")
+
+
+def cmd_ttest(args):
+    tests = analysis.statistical_tests(_load(args, ['year', 'murdrate', 'rpcunemins']),
+                                       split_year=args.split_year)
+    _banner("STATISTICAL TESTING")
+    print(f"T-Test: Murder Rates Before vs After {args.split_year}")
+    print(f"Pre-{args.split_year} Mean: {tests['pre_mean']:.4f}")
+    print(f"Post-{args.split_year} Mean: {tests['post_mean']:.4f}")
+    print(f"T-statistic: {tests['t_stat']:.4f}")
+    print(f"P-value: {tests['p_value']:.4f}")
+    print(f"\nCorrelation: Unemployment vs Murder Rate")
+    print(f"Correlation Coefficient: {tests['corr_coef']:.4f}")
+    print(f"P-value: {tests['corr_pval']:.4f}")
+    if args.resample:
+        resampled = analysis.resampled_tests(
+            _load(args, ['countyid', 'year', 'murdrate', 'rpcunemins']),
+            split_year=args.split_year, n_resamples=args.resample,
+            by_county=not args.rows_independent, seed=args.seed, n_jobs=args.jobs)
+        unit = "rows" if args.rows_independent else "counties"
+        print(f"\nResampling ({args.resample} replicates over {unit}):")
+        for name, label in [('mean_diff', f"Pre-{args.split_year} - post mean"),
+                            ('corr', "Correlation")]:
+            r = resampled[name]
+            print(f"{label}: {r['statistic']:.4f}  95% CI [{r['low']:.4f}, {r['high']:.4f}]  "
+                  f"permutation p-value: {r['p_value']:.4f}")
+
+
+def cmd_breaks(args):
+    from county_murders.breaks import break_scan
+
+    scan = break_scan(_load(args, ['year'] + args.metrics), args.metrics,
+                      equal_var=not args.welch)
+    _banner("STRUCTURAL BREAK SCAN (" + ("Welch" if args.welch else "pooled") + " t-test)")
+    if args.curve:
+        print("t statistic by candidate break year (pre = year < break):")
+        print(scan['curve']['t_stat'].unstack('metric')[args.metrics].round(4))
+        print()
+    print("Largest |t| per metric (nominal p-values, not corrected for the scan):")
+    print(scan['best'][['break_year', 'pre_mean', 'post_mean', 't_stat', 'p_value']].round(4))
+
+
+def cmd_viz(args):
+    from county_murders.figures import FIGURES, build_figure_data, render_figures
+
+    names = [name for name in FIGURES
+             if not args.figures or any(name.startswith(f) for f in args.figures)]
+    if not names:
+        raise SystemExit(f"no figure matches {args.figures}; choose from {list(FIGURES)}")
+    figure_data = build_figure_data(_load(args), names=names,
+                                    density_threshold=args.density_threshold)
+    _banner("VISUALIZATIONS")
+    for name, path, metrics in render_figures(figure_data, out_dir=args.out_dir,
+                                              dpi=args.dpi, force=args.force):
+        status = "up to date (skipped)" if metrics is None else f"{metrics['wall_s']:.2f}s"
+        print(f"✓ {path}: {status}")
+
+
+def cmd_sql(args):
+    from county_murders.sql import run_queries
+
+    pd.set_option('display.width', 120)
+    results, timings = run_queries(_load(args), engine=args.engine, numbers=args.numbers,
+                                   export_dir=args.export_dir)
+    _banner(f"SQL QUERIES ({timings.attrs['engine']})")
+    for number, result in results.items():
+        print("\n" + "-"*80)
+        print(f"Query {number}: {timings.loc[number, 'title']} "
+              f"({timings.loc[number, 'seconds'] * 1000:.1f} ms)")
+        print("-"*80)
+        print(result.head(args.rows) if result is not None else "(no rows)")
+
+
+def _where(items):
+    where = {}
+    for item in items:
+        dim, _, values = item.partition('=')
+        where[dim] = [int(value) for value in values.split(',')]
+    return where
+
+
+def cmd_rollup(args):
+    from county_murders.cube import load_cube
+
+    cube = load_cube(args.source)
+    where = _where(args.where) or None
+    if args.cumulative:
+        result = cube.cumulative(args.measure, args.stat, by=args.by, where=where)
+        title = f"CUMULATIVE {args.stat.upper()} OF {args.measure.upper()}"
+    elif args.moving:
+        result = cube.moving(args.measure, args.stat, by=args.by, window=args.moving, where=where)
+        title = f"{args.moving}-YEAR MOVING AVERAGE OF {args.stat.upper()} {args.measure.upper()}"
+    else:
+        result = cube.stat(args.measure, args.stat, by=args.by, where=where)
+        title = f"{args.stat.upper()} OF {args.measure.upper()}"
+    _banner(title + (f" BY {', '.join(args.by).upper()}" if args.by else ""))
+    print(result.head(args.rows) if args.rows else result)
+
+
+def cmd_sketch(args):
+    from county_murders.sketches import group_sketches
+
+    chunks = iter_chunks(args.source, chunksize=args.chunksize, columns=[args.by, args.column])
+    if args.positive:
+        chunks = (chunk[chunk[args.column] > 0] for chunk in chunks)
+    if args.distinct:
+        result = group_sketches(chunks, args.by, args.column, kind='distinct').distinct()
+        result = result.round().astype(int)
+        title = f"DISTINCT {args.column.upper()} BY {args.by.upper()} (HyperLogLog)"
+    else:
+        result = group_sketches(chunks, args.by, args.column).quantiles(args.quantiles)
+        title = f"QUANTILES OF {args.column.upper()} BY {args.by.upper()} (KLL sketch)"
+    _banner(title)
+    print(result.head(args.rows) if args.rows else result)
+
+
+def cmd_top(args):
+    from county_murders.topk import top_groups, top_rows
+
+    if args.records:
+        columns = list(dict.fromkeys(c for c in (args.by, 'countyid', 'year', args.metric) if c))
+        chunks = iter_chunks(args.source, chunksize=args.chunksize, columns=columns)
+        result = top_rows(chunks, args.metric, args.k, by=args.by)
+        title = f"TOP {args.k} ROWS BY {args.metric.upper()}"
+    else:
+        columns = [c for c in (args.by, args.key, args.metric) if c]
+        chunks = iter_chunks(args.source, chunksize=args.chunksize, columns=columns)
+        result = top_groups(chunks, args.key, args.metric, by=args.by).top(args.k, args.stat)
+        title = f"TOP {args.k} {args.key.upper()} BY {args.stat.upper()} OF {args.metric.upper()}"
+    _banner(title + (f" PER {args.by.upper()}" if args.by else ""))
+    print(result)
+
+
+def cmd_panel(args):
+    from county_murders.panel import Panel
+
+    panel = Panel.from_frame(_load(args, ['countyid', 'year', 'statefips', args.metric]),
+                             [args.metric])
+    if args.diff:
+        values, title = panel.diff(args.metric), "YEAR-OVER-YEAR CHANGE IN"
+    elif args.pct_change:
+        values, title = panel.pct_change(args.metric) * 100, "YEAR-OVER-YEAR % CHANGE IN"
+    elif args.moving:
+        values, title = panel.rolling_mean(args.metric, args.moving), f"{args.moving}-YEAR MOVING AVERAGE OF"
+    elif args.cumulative:
+        values, title = panel.cumsum(args.metric), "CUMULATIVE"
+    else:
+        values, title = panel[args.metric], ""
+    table = panel.frame(values)
+    if args.counties:
+        missing = sorted(set(args.counties) - set(panel.counties.tolist()))
+        if missing:
+            raise SystemExit(f"unknown counties: {missing}")
+        table = table.loc[args.counties]
+    _banner(f"{title} {args.metric.upper()} BY COUNTY AND YEAR".strip())
+    print(table.T.round(3) if args.counties else table.head(args.rows).round(3))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m county_murders',
+        description="Run a single stage of the county murders analysis.")
+    parser.add_argument('--source', default=DATA_URL,
+                        help='dataset URL or local CSV path (default: the published CSV)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='revalidate the cached download first')
+    sub = parser.add_subparsers(dest='command', required=True, metavar='COMMAND')
+
+    p = sub.add_parser('describe', help='shape, head, describe() and missing values')
+    p.add_argument('--stream', action='store_true',
+                   help='one chunked pass in bounded memory (approximate quantiles)')
+    p.add_argument('--chunksize', type=int, default=100_000, help='rows per chunk with --stream')
+
+    p = sub.add_parser('trends', help='murder totals by year and by state')
+    p.add_argument('--top', type=int, default=10, help='states to show')
+
+    p = sub.add_parser('correlate', help='correlation of the key variables with a target')
+    p.add_argument('--target', default='murdrate')
+    p.add_argument('--stream', action='store_true',
+                   help='accumulate co-moments over CSV chunks in constant memory')
+    p.add_argument('--chunksize', type=int, default=100_000, help='rows per chunk with --stream')
+    p.add_argument('--tests', action='store_true',
+                   help='t statistic, p-value and BH q-value for every pair of variables')
+    p.add_argument('--by', choices=['year', 'statefips'], help='test within each year or state')
+    p.add_argument('--family', choices=['all', 'group'], default='all',
+                   help='pairs the q-values are adjusted over with --by (default: all)')
+    p.add_argument('--all-columns', action='store_true',
+                   help='test every numeric column, not just the key variables')
+    p.add_argument('--alpha', type=float, default=0.05, help='false discovery rate to report')
+    p.add_argument('--rows', type=int, default=20, help='pairs to show with --tests')
+
+    p = sub.add_parser('cluster', help='KMeans clustering (with elbow sweep)')
+    p.add_argument('--k', type=int, default=4, help='number of clusters')
+    p.add_argument('--no-elbow', action='store_true', help='skip the K = 2..10 sweep')
+    p.add_argument('--stream', action='store_true',
+                   help='MiniBatchKMeans over CSV chunks instead of the in-memory fit (no sweep)')
+    p.add_argument('--chunksize', type=int, default=100_000, help='rows per chunk with --stream')
+    p.add_argument('--epochs', type=int, default=1, help='passes over the chunks with --stream')
+    p.add_argument('--sample', type=int, default=20_000,
+                   help='rows kept for the k-means++ start and the full-batch comparison')
+
+    p = sub.add_parser('pca', help='explained variance and loadings')
+    p.add_argument('--loadings', type=int, default=3, help='components to show loadings for')
+    p.add_argument('--solver', choices=['full', 'randomized', 'incremental'], default='full',
+                   help='exact, truncated randomized SVD, or IncrementalPCA over CSV chunks')
+    p.add_argument('--components', type=int,
+                   help='components to compute (default: all; 5 for randomized)')
+    p.add_argument('--chunksize', type=int, default=100_000,
+                   help='rows per chunk for the incremental solver')
+    p.add_argument('--compare', action='store_true',
+                   help='report agreement of the explained variance with the exact solver')
+
+    p = sub.add_parser('ttest', help='pre/post t-test and unemployment correlation')
+    p.add_argument('--split-year', type=int, default=1988)
+    p.add_argument('--resample', type=int, default=0, metavar='N',
+                   help='also report bootstrap CIs and permutation p-values from N replicates')
+    p.add_argument('--rows-independent', action='store_true',
+                   help='resample rows instead of whole counties')
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--jobs', type=int, help='worker processes for --resample (default: all cores)')
+
+    p = sub.add_parser('breaks', help='t-test of every candidate break year per metric')
+    p.add_argument('--metrics', nargs='+', default=['murdrate', 'murders', 'arrestrate', 'rpcunemins'])
+    p.add_argument('--welch', action='store_true', help="Welch's test instead of pooled variance")
+    p.add_argument('--curve', action='store_true', help='show the statistic for every candidate')
+
+    p = sub.add_parser('viz', help='render figures (all, or those matching a prefix)')
+    p.add_argument('figures', nargs='*', metavar='FIGURE',
+                   help='file name or prefix, e.g. 03 or 10_pca (default: all)')
+    p.add_argument('--force', action='store_true', help='re-render up-to-date figures')
+    p.add_argument('--out-dir', default='visualizations')
+    p.add_argument('--dpi', type=int, default=300)
+    p.add_argument('--density-threshold', type=int, default=100_000, metavar='ROWS',
+                   help='draw plots 4, 7 and 8 as binned density grids above this many rows')
+
+    p = sub.add_parser('sql', help='run the queries of county_murders_queries.sql')
+    p.add_argument('numbers', nargs='*', type=int, metavar='N',
+                   help='query numbers (default: all)')
+    p.add_argument('--engine', choices=['duckdb', 'sqlite'])
+    p.add_argument('--export-dir', default='sql_output')
+    p.add_argument('--rows', type=int, default=10, help='rows to show per result')
+
+    p = sub.add_parser('rollup', help='year/state/county aggregates from the cached cube')
+    p.add_argument('--by', nargs='*', default=['year'], choices=['year', 'statefips', 'countyid'],
+                   help='dimensions to group by (default: year; none for the grand total)')
+    p.add_argument('--measure', default='murders',
+                   choices=['murders', 'arrests', 'murdrate', 'popul'])
+    p.add_argument('--stat', default='sum', choices=['count', 'sum', 'mean', 'var', 'std'])
+    p.add_argument('--where', nargs='*', default=[], metavar='DIM=V[,V...]',
+                   help='filter cells first, e.g. statefips=6,36')
+    window = p.add_mutually_exclusive_group()
+    window.add_argument('--cumulative', action='store_true', help='running total over years')
+    window.add_argument('--moving', type=int, metavar='YEARS', help='moving average over years')
+    p.add_argument('--rows', type=int, default=0, help='rows to show (default: all)')
+
+    p = sub.add_parser('sketch', help='streamed per-group quantiles or distinct counts')
+    p.add_argument('--by', default='year', choices=['year', 'statefips', 'countyid'])
+    p.add_argument('--column', default='murdrate')
+    p.add_argument('--quantiles', nargs='+', type=float, default=[0.25, 0.5, 0.75], metavar='Q')
+    p.add_argument('--distinct', action='store_true',
+                   help='estimate the distinct values of the column instead')
+    p.add_argument('--positive', action='store_true',
+                   help='only rows where the column is > 0 (as in Query 18)')
+    p.add_argument('--chunksize', type=int, default=100_000)
+    p.add_argument('--rows', type=int, default=0, help='rows to show (default: all)')
+
+    p = sub.add_parser('top', help='exact top-k groups (or rows) from streamed chunks')
+    p.add_argument('--metric', default='murders')
+    p.add_argument('--k', type=int, default=10)
+    p.add_argument('--key', default='countyid', choices=['countyid', 'statefips', 'year'],
+                   help='groups to rank (default: countyid)')
+    p.add_argument('--stat', default='sum', choices=['sum', 'count', 'mean'])
+    p.add_argument('--by', choices=['year', 'statefips'], help='rank within each year or state')
+    p.add_argument('--records', action='store_true',
+                   help='rank individual county-year rows instead of group totals')
+    p.add_argument('--chunksize', type=int, default=100_000)
+
+    p = sub.add_parser('panel', help='county x year series from the dense panel arrays')
+    p.add_argument('counties', nargs='*', type=int, metavar='COUNTYID',
+                   help='counties to show (default: the first --rows counties)')
+    p.add_argument('--metric', default='murders')
+    op = p.add_mutually_exclusive_group()
+    op.add_argument('--diff', action='store_true', help='change from the previous year')
+    op.add_argument('--pct-change', action='store_true', help='percent change from the previous year')
+    op.add_argument('--moving', type=int, metavar='YEARS', help='centred moving average')
+    op.add_argument('--cumulative', action='store_true', help='running total over years')
+    p.add_argument('--rows', type=int, default=10, help='counties to show without COUNTYID')
+    return parser
+
+
+COMMANDS = {
+    'describe': cmd_describe,
+    'trends': cmd_trends,
+    'correlate': cmd_correlate,
+    'cluster': cmd_cluster,
+    'pca': cmd_pca,
+    'ttest': cmd_ttest,
+    'breaks': cmd_breaks,
+    'viz': cmd_viz,
+    'sql': cmd_sql,
+    'rollup': cmd_rollup,
+    'sketch': cmd_sketch,
+    'top': cmd_top,
+    'panel': cmd_panel,
+}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    COMMANDS[args.command](args)
+
+
+if __name__ == '__main__':
+    main()
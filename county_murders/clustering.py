@@ -0,0 +1,241 @@
+"""
+K-means model selection (elbow method) for the clustering step.
+
+elbow_sweep() runs every KMeans restart of every k as an independent
+single-init fit on a process pool.  Each (k, restart) pair gets its own
+seed derived from ``random_state``, and the best restart per k is picked
+by inertia, so the table does not depend on the number of workers.
+
+streaming_kmeans() is the out-of-core alternative for panels too large
+to hold ``X_scaled`` in memory: it consumes chunks from
+data.iter_chunks(), updates MiniBatchKMeans centroids incrementally and
+assigns labels in a separate streaming pass.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from county_murders.lazy import lazy_import
+from county_murders.parallel import map_tasks
+
+# Imported on first use, so importing this module stays cheap
+sk_cluster = lazy_import('sklearn.cluster')
+sk_metrics = lazy_import('sklearn.metrics')
+sk_preprocessing = lazy_import('sklearn.preprocessing')
+
+# Rows sampled for the silhouette score on large inputs
+SILHOUETTE_SAMPLE = 2000
+
+# Matrix shared with the workers (set once per process, not pickled per task)
+_X = None
+
+
+def _set_matrix(X):
+    global _X
+    _X = X
+
+
+def restart_seed(random_state, k, restart):
+    """Deterministic seed for one (k, restart) fit."""
+    return int(np.random.SeedSequence([random_state, k, restart]).generate_state(1)[0])
+
+
+def _fit_restart(task):
+    k, restart, seed = task
+    start = time.perf_counter()
+    km = sk_cluster.KMeans(n_clusters=k, n_init=1, random_state=seed).fit(_X)
+    return k, restart, km.inertia_, km.cluster_centers_, time.perf_counter() - start
+
+
+def _silhouette_rows(n_rows, silhouette_sample, random_state):
+    """Rows scored by the silhouette: all of them, or one fixed sample for every k."""
+    if not silhouette_sample or n_rows <= silhouette_sample:
+        return None
+    rng = np.random.default_rng(random_state)
+    return np.sort(rng.choice(n_rows, silhouette_sample, replace=False))
+
+
+def _score(X, distances, rows, centers):
+    labels = sk_metrics.pairwise_distances_argmin(X, centers)
+    if distances is None:
+        silhouette = sk_metrics.silhouette_score(X, labels)
+    else:
+        sampled = labels if rows is None else labels[rows]
+        silhouette = sk_metrics.silhouette_score(distances, sampled, metric='precomputed')
+    return silhouette, sk_metrics.calinski_harabasz_score(X, labels)
+
+
+def elbow_sweep(X, k_values=range(2, 11), n_init=10, random_state=42, n_jobs=None,
+                silhouette_sample=SILHOUETTE_SAMPLE):
+    """Fit KMeans for each k and report cluster-quality metrics.
+
+    Parameters
+    ----------
+    X : array-like
+        Scaled feature matrix.
+    k_values : iterable of int
+        Cluster counts to try.
+    n_init : int
+        Restarts per k; the restart with the lowest inertia is kept.
+    n_jobs : int, optional
+        Worker processes (None = all cores).  Does not affect the results.
+    silhouette_sample : int, optional
+        Rows sampled for the O(n^2) silhouette score on large inputs.  One
+        sample (drawn from ``random_state``) is shared by every k, so its
+        distance matrix is computed once; None scores all rows.
+
+    Returns
+    -------
+    DataFrame indexed by k with columns inertia, silhouette,
+    calinski_harabasz and fit_time (seconds summed over restarts).
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    k_values = list(k_values)
+    tasks = [(k, r, restart_seed(random_state, k, r)) for k in k_values for r in range(n_init)]
+    fits = map_tasks(_fit_restart, tasks, n_jobs, _set_matrix, (X,))
+
+    best = {}
+    fit_time = dict.fromkeys(k_values, 0.0)
+    for k, restart, inertia, centers, elapsed in fits:
+        fit_time[k] += elapsed
+        # Ties go to the lower restart number, whatever order results arrive in
+        if k not in best or (inertia, restart) < best[k][:2]:
+            best[k] = (inertia, restart, centers)
+
+    # Scoring is cheap next to the fits once the distances are shared, so
+    # it runs here rather than on the pool
+    rows = _silhouette_rows(len(X), silhouette_sample, random_state)
+    distances = None
+    if silhouette_sample:
+        distances = sk_metrics.pairwise_distances(X if rows is None else X[rows])
+    scores = {k: _score(X, distances, rows, best[k][2]) for k in k_values}
+
+    return pd.DataFrame({
+        'inertia': [best[k][0] for k in k_values],
+        'silhouette': [scores[k][0] for k in k_values],
+        'calinski_harabasz': [scores[k][1] for k in k_values],
+        'fit_time': [fit_time[k] for k in k_values],
+    }, index=pd.Index(k_values, name='k'))
+
+
+# ---------------------------------------------------------------------------
+# Streaming (mini-batch) K-means for inputs that do not fit in memory
+# ---------------------------------------------------------------------------
+
+def _reservoir_update(reservoir, seen, rows, rng):
+    """Algorithm R over a chunk of rows; returns the new ``seen`` count."""
+    size = len(reservoir)
+    fill = max(0, min(size - seen, len(rows)))
+    if fill:
+        reservoir[seen:seen + fill] = rows[:fill]
+    rest = rows[fill:]
+    if len(rest):
+        positions = seen + fill + np.arange(len(rest))
+        slots = (rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+        keep = slots < size
+        reservoir[slots[keep]] = rest[keep]
+    return seen + len(rows)
+
+
+def streaming_kmeans(read_chunks, columns, n_clusters=4, random_state=42,
+                     batch_size=4096, n_epochs=1, sample_size=20000):
+    """Fit a scaler and MiniBatchKMeans from a stream of chunks.
+
+    Parameters
+    ----------
+    read_chunks : callable
+        Zero-argument callable returning a fresh iterator of DataFrames,
+        e.g. ``lambda: data.iter_chunks(chunksize=500_000)``.  It is called
+        once for the scaler pass and once per epoch.
+    columns : list of str
+        Feature columns (e.g. ``cluster_vars``).
+    sample_size : int
+        Rows kept in a uniform reservoir sample, used to initialise the
+        centroids with k-means++ and by :func:`compare_with_full_batch`.
+
+    Peak memory is one chunk plus the reservoir sample.
+
+    Returns
+    -------
+    (scaler, model, sample) where ``sample`` holds unscaled sample rows.
+    """
+    columns = list(columns)
+    rng = np.random.default_rng(random_state)
+    scaler = sk_preprocessing.StandardScaler()
+    reservoir = np.empty((sample_size, len(columns)))
+    seen = 0
+    for chunk in read_chunks():
+        rows = chunk[columns].to_numpy(dtype=np.float64)
+        if len(rows):
+            scaler.partial_fit(rows)
+            seen = _reservoir_update(reservoir, seen, rows, rng)
+    sample = reservoir[:min(seen, sample_size)]
+    if len(sample) < n_clusters:
+        raise ValueError(f"Need at least {n_clusters} complete rows, got {len(sample)}")
+
+    init, _ = sk_cluster.kmeans_plusplus(scaler.transform(sample), n_clusters,
+                                         random_state=random_state)
+    model = sk_cluster.MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1,
+                                       batch_size=batch_size, random_state=random_state)
+    for _ in range(n_epochs):
+        for chunk in read_chunks():
+            X = scaler.transform(chunk[columns].to_numpy(dtype=np.float64))
+            for start in range(0, len(X), batch_size):
+                batch = X[start:start + batch_size]
+                if len(batch):
+                    model.partial_fit(batch)
+    return scaler, model, sample
+
+
+def streaming_labels(read_chunks, columns, scaler, model):
+    """Second pass: yield ``(index, labels)`` for every chunk."""
+    columns = list(columns)
+    for chunk in read_chunks():
+        if len(chunk):
+            X = scaler.transform(chunk[columns].to_numpy(dtype=np.float64))
+            yield chunk.index, model.predict(X)
+
+
+def streaming_cluster_summary(read_chunks, columns, scaler, model):
+    """Cluster sizes and per-cluster feature means, computed chunk by chunk.
+
+    Returns ``(counts, means)`` shaped like
+    ``X_cluster['Cluster'].value_counts()`` and
+    ``X_cluster.groupby('Cluster')[columns].mean()``.
+    """
+    columns = list(columns)
+    k = model.n_clusters
+    counts = np.zeros(k, dtype=np.int64)
+    sums = np.zeros((k, len(columns)))
+    for chunk in read_chunks():
+        if not len(chunk):
+            continue
+        raw = chunk[columns].to_numpy(dtype=np.float64)
+        labels = model.predict(scaler.transform(raw))
+        counts += np.bincount(labels, minlength=k)
+        np.add.at(sums, labels, raw)
+    index = pd.Index(range(k), name='Cluster')
+    means = pd.DataFrame(sums / np.maximum(counts, 1)[:, None], index=index, columns=columns)
+    return pd.Series(counts, index=index, name='count'), means
+
+
+def compare_with_full_batch(scaler, model, sample, n_init=10, random_state=42):
+    """How far the streaming centroids are from a full-batch fit on ``sample``.
+
+    Returns a dict with both inertias on the scaled sample, their relative
+    gap ((streaming - full) / full) and the adjusted Rand index between
+    the two labelings.
+    """
+    X = scaler.transform(sample)
+    full = sk_cluster.KMeans(n_clusters=model.n_clusters, n_init=n_init,
+                             random_state=random_state).fit(X)
+    stream_labels = model.predict(X)
+    stream_inertia = float(((X - model.cluster_centers_[stream_labels]) ** 2).sum())
+    return {
+        'sample_rows': len(X),
+        'streaming_inertia': stream_inertia,
+        'full_batch_inertia': float(full.inertia_),
+        'relative_gap': (stream_inertia - full.inertia_) / full.inertia_,
+        'adjusted_rand': sk_metrics.adjusted_rand_score(full.labels_, stream_labels),
+    }
@@ -0,0 +1,274 @@
+"""
+In-memory year x state x county aggregate cube.
+
+Most of the SQL queries and several figures are slices of the same few
+aggregates: totals per year, per state, per state-year and per county,
+plus cumulative and moving windows over years.  The cube holds one cell
+per (year, statefips, countyid) with the count, sum and sum of squares of
+each measure; every roll-up is a sum of cells, so it is answered without
+going back to the rows:
+
+    cube = load_cube()                                 # built once, cached on disk
+    cube.stat('murders', 'sum', by=['year'])           # Query 8 / figure 1
+    cube.stat('murdrate', 'mean', by=['statefips'])    # Query 12
+    cube.cumulative('murders', by=['statefips'])       # Query 17
+    cube.moving('murdrate', 'mean', window=3)          # Query 16
+
+Roll-ups are memoized, so repeated questions cost a dictionary lookup.
+Count, sum and sum of squares are additive, which makes the cube
+incremental (update() folds in another chunk of rows, merge() another
+cube) and lets it be saved as a plain Feather table (save()/load()).
+Variances come from ``(sumsq - sum**2 / n) / (n - 1)``; that is exact
+enough for these measures, but not a substitute for a two-pass variance on
+data with a huge mean relative to its spread.
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from county_murders import schema
+from county_murders.aggregate import _bincount, _factorize
+from county_murders.data import DATA_URL, dataset_sha256, get_cache_dir, load_clean
+
+DIMENSIONS = ['year', 'statefips', 'countyid']
+MEASURES = ['murders', 'arrests', 'murdrate', 'popul']
+STATS = ('count', 'sum', 'mean', 'var', 'std')
+
+
+def _cells(df, measures):
+    """Count/sum/sumsq per (year, statefips, countyid) of one batch of rows."""
+    codes, levels = [], []
+    for dim in DIMENSIONS:
+        dim_codes, uniques = _factorize(df[dim])
+        codes.append(dim_codes)
+        levels.append(uniques)
+    valid = np.all([c >= 0 for c in codes], axis=0)
+    codes = [c[valid] for c in codes]
+    flat = np.ravel_multi_index(codes, [len(u) for u in levels])
+    cell_codes, cell_ids = _factorize(pd.Series(flat))
+    n_cells = len(cell_ids)
+
+    values = np.asfortranarray(df[measures].to_numpy(dtype=np.float64, na_value=np.nan)[valid])
+    present = ~np.isnan(values)
+    values = np.where(present, values, 0.0)
+
+    columns = {}
+    counts = _bincount(cell_codes, present.astype(np.float64), n_cells)
+    sums = _bincount(cell_codes, values, n_cells)
+    sumsqs = _bincount(cell_codes, values * values, n_cells)
+    for j, measure in enumerate(measures):
+        columns[f'{measure}_count'] = counts[:, j].astype(np.int64)
+        if df[measure].dtype.kind in 'iub':
+            columns[f'{measure}_sum'] = np.rint(sums[:, j]).astype(np.int64)
+        else:
+            columns[f'{measure}_sum'] = sums[:, j]
+        columns[f'{measure}_sumsq'] = sumsqs[:, j]
+
+    cell_index = np.unravel_index(cell_ids, [len(u) for u in levels])
+    index = pd.MultiIndex.from_arrays(
+        [levels[i][cell_index[i]] for i in range(len(DIMENSIONS))], names=DIMENSIONS)
+    return pd.DataFrame(columns, index=index)
+
+
+def _key(by, where):
+    """Hashable memo key for a roll-up."""
+    if where is None:
+        return by, None
+    return by, tuple(sorted((dim, tuple(np.atleast_1d(value).tolist()))
+                            for dim, value in where.items()))
+
+
+class AggregateCube:
+    """Count, sum and sum of squares of each measure per (year, state, county).
+
+    ``cells`` is a DataFrame indexed by DIMENSIONS with columns
+    ``<measure>_count``, ``<measure>_sum`` and ``<measure>_sumsq``.
+    """
+
+    def __init__(self, cells, measures):
+        self.cells = cells.sort_index()
+        self.measures = list(measures)
+        self._rollups = {}
+        self._stats = {}
+
+    def __repr__(self):
+        return f"AggregateCube(cells={len(self.cells)}, measures={self.measures})"
+
+    @classmethod
+    def from_frame(cls, df, measures=MEASURES):
+        """Build the cube from a table with the DIMENSIONS and ``measures`` columns."""
+        return cls(_cells(df, list(measures)), measures)
+
+    @classmethod
+    def from_chunks(cls, chunks, measures=MEASURES):
+        """Build the cube incrementally from an iterable of DataFrames."""
+        cube = None
+        for chunk in chunks:
+            if cube is None:
+                cube = cls.from_frame(chunk, measures)
+            else:
+                cube.update(chunk)
+        if cube is None:
+            raise ValueError("no chunks to build the cube from")
+        return cube
+
+    def merge(self, other):
+        """Add the cells of another cube (same measures) into this one."""
+        if other.measures != self.measures:
+            raise ValueError(f"measures differ: {self.measures} vs {other.measures}")
+        merged = self.cells.add(other.cells, fill_value=0)
+        self.cells = merged.astype(self.cells.dtypes.to_dict()).sort_index()
+        self._rollups.clear()
+        self._stats.clear()
+        return self
+
+    def update(self, df):
+        """Fold a batch of new rows into the cube."""
+        return self.merge(AggregateCube.from_frame(df, self.measures))
+
+    def rollup(self, by=(), where=None):
+        """Summed cells grouped by the dimensions in ``by``.
+
+        Parameters
+        ----------
+        by : list of str
+            Subset of DIMENSIONS; ``()`` gives the grand total.
+        where : dict, optional
+            Dimension -> value or list of values to keep before rolling up,
+            e.g. ``{'statefips': 6}``.
+
+        Returns
+        -------
+        DataFrame with the cell columns, indexed by ``by``.  The result is
+        memoized; treat it as read-only.
+        """
+        by = tuple(by)
+        unknown = set(by) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown dimensions {sorted(unknown)}; expected {DIMENSIONS}")
+        key = _key(by, where)
+        if key not in self._rollups:
+            cells = self.cells
+            for dim, value in (where or {}).items():
+                cells = cells[cells.index.get_level_values(dim).isin(np.atleast_1d(value))]
+            if by:
+                rolled = cells.groupby(level=list(by)).sum()
+            else:
+                rolled = cells.sum().to_frame('all').T.astype(cells.dtypes.to_dict())
+            self._rollups[key] = rolled
+        return self._rollups[key]
+
+    def stat(self, measure, stat='sum', by=(), where=None):
+        """One statistic of ``measure`` per group of ``by`` (see rollup()).
+
+        ``stat`` is one of count, sum, mean, var or std (ddof=1, matching
+        pandas and SQL ``STDDEV_SAMP``).  Results are memoized like the
+        roll-ups.
+        """
+        key = (measure, stat, _key(tuple(by), where))
+        if key not in self._stats:
+            self._stats[key] = self._stat(measure, stat, by, where)
+        return self._stats[key]
+
+    def _stat(self, measure, stat, by, where):
+        if measure not in self.measures:
+            raise ValueError(f"unknown measure {measure!r}; expected one of {self.measures}")
+        rolled = self.rollup(by, where)
+        count = rolled[f'{measure}_count']
+        total = rolled[f'{measure}_sum']
+        if stat == 'count':
+            values = count
+        elif stat == 'sum':
+            values = total
+        elif stat == 'mean':
+            values = total / count.where(count > 0)
+        elif stat in ('var', 'std'):
+            m2 = (rolled[f'{measure}_sumsq'] - total.astype(np.float64) ** 2 / count.where(count > 0))
+            values = m2.clip(lower=0) / (count - 1).where(count > 1)
+            if stat == 'std':
+                values = np.sqrt(values)
+        else:
+            raise ValueError(f"unknown statistic {stat!r}; expected one of {STATS}")
+        return values.rename(measure)
+
+    def _by_year(self, measure, stat, by, where):
+        """``stat`` as a year x group table (groups of ``by`` as columns)."""
+        by = [dim for dim in by if dim != 'year']
+        values = self.stat(measure, stat, by=['year'] + by, where=where)
+        table = values.unstack(by) if by else values.to_frame(measure)
+        years = table.index
+        return table.reindex(range(int(years.min()), int(years.max()) + 1)), by
+
+    @staticmethod
+    def _stack(table, by, measure):
+        if not by:
+            return table[measure].dropna()
+        stacked = table.stack(list(range(len(by))), future_stack=True).dropna()
+        return stacked.reorder_levels(by + ['year']).sort_index().rename(measure)
+
+    def moving(self, measure, stat='mean', by=(), window=3, center=True, where=None):
+        """Moving average over years of the yearly ``stat`` within each group.
+
+        With the defaults this is Query 16's ``AVG(AVG(murdrate)) OVER
+        (ORDER BY year ROWS BETWEEN 1 PRECEDING AND 1 FOLLOWING)``.
+        """
+        table, by = self._by_year(measure, stat, by, where)
+        moved = table.rolling(window, center=center, min_periods=1).mean()
+        return self._stack(moved.where(table.notna()), by, measure)
+
+    def cumulative(self, measure, stat='sum', by=(), where=None):
+        """Running total over years of the yearly ``stat`` within each group.
+
+        ``cumulative('murders', by=['statefips'])`` is Query 17.
+        """
+        table, by = self._by_year(measure, stat, by, where)
+        running = self._stack(table.cumsum().where(table.notna()), by, measure)
+        # Missing years made the table float; integer totals stay integer
+        dtype = self.stat(measure, stat, by=['year'] + by, where=where).dtype
+        return running.astype(dtype) if dtype.kind in 'iu' else running
+
+    def save(self, path):
+        """Write the cells as an uncompressed Feather file (atomically)."""
+        from pyarrow import feather
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.part')
+        os.close(fd)
+        try:
+            feather.write_feather(self.cells.reset_index(), tmp, compression='uncompressed')
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path):
+        from pyarrow import feather
+
+        cells = feather.read_table(path).to_pandas().set_index(DIMENSIONS)
+        measures = [column[:-len('_count')] for column in cells.columns
+                    if column.endswith('_count')]
+        return cls(cells, measures)
+
+
+def cube_path(sha256, cache_dir=None):
+    """Location of the cached cube for a dataset hash (and the parse schema)."""
+    return os.path.join(get_cache_dir(cache_dir), 'cubes', f'{sha256}.{schema.fingerprint()}.arrow')
+
+
+def load_cube(source=DATA_URL, cache_dir=None, offline=None, measures=MEASURES):
+    """Cube of the cleaned dataset, built on first use and cached on disk."""
+    path = cube_path(dataset_sha256(source, cache_dir, offline), cache_dir)
+    if os.path.exists(path):
+        cube = AggregateCube.load(path)
+        if cube.measures == list(measures):
+            return cube
+    df_clean = load_clean(source, cache_dir=cache_dir, offline=offline,
+                          columns=DIMENSIONS + list(measures))
+    cube = AggregateCube.from_frame(df_clean, measures)
+    cube.save(path)
+    return cube
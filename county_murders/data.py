@@ -0,0 +1,354 @@
+"""
+Data loading for the county murders dataset.
+
+The CSV is downloaded once into a local, content-addressed cache:
+
+    <cache_dir>/blobs/<sha256>.csv   file contents, named by their hash
+    <cache_dir>/index.json           source URL -> sha256, size, ETag, ...
+
+Later runs read the cached blob straight from disk.  Local files are
+copied in the same way; their modification time and size are kept in the
+index, and a file edited in place is copied again.  Offline mode
+(``offline=True`` or ``COUNTY_MURDERS_OFFLINE=1``) never touches the
+network and fails if a remote source has not been cached yet.
+
+The parsed table and the cleaned table (``df.dropna()``) are additionally
+written once as uncompressed Arrow IPC (Feather v2) snapshots:
+
+    <cache_dir>/snapshots/<sha256>.<compact|default>.<schema>.raw.arrow
+    <cache_dir>/snapshots/<sha256>.<compact|default>.<schema>.arrow
+
+and memory-mapped on later runs, so the CSV is parsed only to build them
+and only the columns a step reads are paged in.  ``<schema>`` is
+schema.fingerprint(): editing the schema (or upgrading pandas) builds new
+snapshots instead of serving old dtypes.  Snapshots keep the table's
+index.  They need pyarrow; without it load_raw() and load_clean()
+fall back to parsing the CSV.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import warnings
+
+import pandas as pd
+
+from county_murders import schema
+
+DATA_URL = "https://raw.githubusercontent.com/salemprakash/EDA/main/Data/countymurders.csv"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'county_murders')
+
+_CHUNK = 1 << 20
+
+
+def get_cache_dir(cache_dir=None):
+    """Return the cache directory (argument, $COUNTY_MURDERS_CACHE or default)."""
+    if cache_dir is None:
+        cache_dir = os.environ.get('COUNTY_MURDERS_CACHE', DEFAULT_CACHE_DIR)
+    return os.path.abspath(cache_dir)
+
+
+def is_offline(offline=None):
+    """Resolve offline mode from the argument or $COUNTY_MURDERS_OFFLINE."""
+    if offline is not None:
+        return bool(offline)
+    return os.environ.get('COUNTY_MURDERS_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+
+def file_sha256(path):
+    """Hash a file in 1 MiB chunks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_CHUNK), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _normalize_source(source):
+    # Plain filesystem paths are fetched through file:// so local files and
+    # stub servers go through exactly the same code path as the real URL.
+    if '://' not in source:
+        return 'file://' + os.path.abspath(source)
+    return source
+
+
+def _source_stat(url):
+    """Modification time and size of a file:// source (None for remote or missing files)."""
+    if not url.startswith('file://'):
+        return None
+    try:
+        st = os.stat(urllib.request.url2pathname(urllib.parse.urlparse(url).path))
+    except OSError:
+        return None
+    return {'source_mtime_ns': st.st_mtime_ns, 'source_size': st.st_size}
+
+
+def _read_index(cache_dir):
+    path = os.path.join(cache_dir, 'index.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json_atomic(path, payload):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _blob_path(cache_dir, sha256):
+    return os.path.join(cache_dir, 'blobs', sha256 + '.csv')
+
+
+def _valid_entry(cache_dir, entry, verify):
+    """Check a cached blob against its stored metadata."""
+    if not entry:
+        return False
+    path = _blob_path(cache_dir, entry['sha256'])
+    try:
+        if os.path.getsize(path) != entry['size']:
+            return False
+    except OSError:
+        return False
+    return not verify or file_sha256(path) == entry['sha256']
+
+
+def _download(url, cache_dir, entry, timeout):
+    """Fetch ``url`` into the blob store; returns the new index entry.
+
+    A conditional request is made when the old entry carries an ETag or
+    Last-Modified header, so an unchanged file costs a single 304.
+    """
+    request = urllib.request.Request(url)
+    if entry and entry.get('etag'):
+        request.add_header('If-None-Match', entry['etag'])
+    if entry and entry.get('last_modified'):
+        request.add_header('If-Modified-Since', entry['last_modified'])
+
+    blob_dir = os.path.join(cache_dir, 'blobs')
+    os.makedirs(blob_dir, exist_ok=True)
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and entry:
+            return dict(entry, checked_at=time.time())
+        raise
+
+    h = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=blob_dir, suffix='.part')
+    try:
+        with response, os.fdopen(fd, 'wb') as out:
+            for block in iter(lambda: response.read(_CHUNK), b''):
+                h.update(block)
+                size += len(block)
+                out.write(block)
+        sha256 = h.hexdigest()
+        os.replace(tmp, _blob_path(cache_dir, sha256))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    headers = response.headers
+    now = time.time()
+    return {
+        'sha256': sha256,
+        'size': size,
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'fetched_at': now,
+        'checked_at': now,
+    }
+
+
+def cached_path(source=DATA_URL, cache_dir=None, offline=None, refresh=False,
+                verify=False, timeout=30):
+    """Return the local path of the cached copy of ``source``.
+
+    Parameters
+    ----------
+    source : str
+        URL (http, https, file) or local path of the CSV.
+    cache_dir : str, optional
+        Cache location; see :func:`get_cache_dir`.
+    offline : bool, optional
+        Never use the network.  Raises FileNotFoundError on a cache miss.
+    refresh : bool
+        Revalidate with the server even if a cached copy exists.
+    verify : bool
+        Re-hash the cached blob instead of only checking its size.
+
+    A local source whose modification time or size differs from the ones
+    recorded when it was copied is copied again (also offline).
+    """
+    url = _normalize_source(source)
+    cache_dir = get_cache_dir(cache_dir)
+    index = _read_index(cache_dir)
+    entry = index.get(url)
+    valid = _valid_entry(cache_dir, entry, verify)
+    # Taken before copying, so an edit during the copy is caught next time
+    source_stat = _source_stat(url)
+    current = valid and (source_stat is None
+                         or all(entry.get(key) == value for key, value in source_stat.items()))
+
+    if is_offline(offline) and source_stat is None:
+        if not valid:
+            raise FileNotFoundError(
+                f"Offline mode: no valid cached copy of {url} in {cache_dir}")
+        return _blob_path(cache_dir, entry['sha256'])
+
+    if current and not refresh:
+        return _blob_path(cache_dir, entry['sha256'])
+
+    try:
+        new_entry = _download(url, cache_dir, entry if current else None, timeout)
+    except (urllib.error.URLError, OSError) as exc:
+        if valid:
+            warnings.warn(f"Could not refresh {url} ({exc}); using cached copy")
+            return _blob_path(cache_dir, entry['sha256'])
+        raise
+    if source_stat is not None:
+        new_entry.update(source_stat)
+
+    index = _read_index(cache_dir)
+    index[url] = new_entry
+    _write_json_atomic(os.path.join(cache_dir, 'index.json'), index)
+    return _blob_path(cache_dir, new_entry['sha256'])
+
+
+def iter_chunks(source=DATA_URL, chunksize=100_000, columns=None, dropna=True,
+                cache_dir=None, offline=None):
+    """Yield the dataset in chunks of ``chunksize`` rows.
+
+    Rows with any missing value are dropped per chunk (``dropna=True``), so
+    the chunks concatenate to ``df.dropna()``.  DECIMAL columns are parsed
+    as float32; integers keep a fixed 64-bit type so every chunk has the
+    same dtypes.
+    """
+    path = cached_path(source, cache_dir=cache_dir, offline=offline)
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype=schema.parse_dtypes()):
+        if dropna:
+            chunk = chunk.dropna()
+        if columns is not None:
+            chunk = chunk[list(columns)]
+        yield chunk
+
+
+def dataset_sha256(source=DATA_URL, cache_dir=None, offline=None):
+    """Content hash of the cached dataset (downloading it if needed)."""
+    return os.path.basename(cached_path(source, cache_dir, offline)).split('.')[0]
+
+
+def _snapshots_enabled():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        warnings.warn("pyarrow is not installed; parsing the CSV instead of using a snapshot")
+        return False
+    return True
+
+
+def _parse(path, compact, **read_csv_kwargs):
+    if compact:
+        return schema.read_csv(path, **read_csv_kwargs)
+    return pd.read_csv(path, **read_csv_kwargs)
+
+
+def load_raw(source=DATA_URL, cache_dir=None, offline=None, refresh=False,
+             compact=True, **read_csv_kwargs):
+    """Load the dataset through the local cache.
+
+    With ``compact=True`` the column schema from county_murders/schema.py
+    is applied at parse time (float32 decimals, downcast integers).  The
+    parsed table is read from its snapshot when one exists; extra
+    ``read_csv_kwargs`` always parse the CSV.
+    """
+    path = cached_path(source, cache_dir=cache_dir, offline=offline, refresh=refresh)
+    if read_csv_kwargs or not _snapshots_enabled():
+        return _parse(path, compact, **read_csv_kwargs)
+
+    sha256 = os.path.basename(path).split('.')[0]
+    snap = snapshot_path(sha256, cache_dir, compact, raw=True)
+    if os.path.exists(snap):
+        return read_snapshot(snap)
+    df = _parse(path, compact)
+    write_snapshot(df, snap)
+    return df
+
+
+def snapshot_path(sha256, cache_dir=None, compact=True, raw=False):
+    """Location of the df_clean (or, with ``raw=True``, df) snapshot for a dataset hash."""
+    kind = 'compact' if compact else 'default'
+    suffix = '.raw.arrow' if raw else '.arrow'
+    return os.path.join(get_cache_dir(cache_dir), 'snapshots',
+                        f'{sha256}.{kind}.{schema.fingerprint()}{suffix}')
+
+
+def write_snapshot(df_clean, path):
+    """Write ``df_clean`` as an uncompressed Feather v2 file (atomically)."""
+    from pyarrow import feather
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    os.close(fd)
+    try:
+        # Uncompressed so the file can be memory-mapped without decoding
+        feather.write_feather(df_clean, tmp, compression='uncompressed')
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def read_snapshot(path, columns=None):
+    """Memory-map a snapshot, materialising only ``columns`` (and the index)."""
+    from pyarrow import feather
+
+    # Memory-mapped: selecting columns afterwards reads nothing extra
+    table = feather.read_table(path, memory_map=True)
+    if columns is not None:
+        # A stored (non-range) index is a column of its own; keep it too
+        metadata = table.schema.pandas_metadata or {}
+        index = [name for name in metadata.get('index_columns', []) if isinstance(name, str)]
+        table = table.select(list(columns) + index)
+    return table.to_pandas(split_blocks=True)
+
+
+def load_clean(source=DATA_URL, cache_dir=None, offline=None, refresh=False,
+               compact=True, columns=None, raw=None):
+    """Return the cleaned table (``df.dropna()``), via the columnar snapshot.
+
+    Parameters
+    ----------
+    columns : list of str, optional
+        Only load these columns from the snapshot.
+    raw : DataFrame, optional
+        Already loaded raw table, used to build a missing snapshot without
+        reading the raw table again.  It must be the unmodified result of
+        ``load_raw(source, compact=compact)``: the snapshot is stored under
+        the source's hash, so a filtered or edited frame would be served
+        as that source's cleaned table from then on.
+    """
+    path = cached_path(source, cache_dir=cache_dir, offline=offline, refresh=refresh)
+    sha256 = os.path.basename(path).split('.')[0]
+    snap = snapshot_path(sha256, cache_dir, compact) if _snapshots_enabled() else None
+
+    if snap is not None and os.path.exists(snap):
+        return read_snapshot(snap, columns)
+
+    if raw is None:
+        raw = load_raw(source, cache_dir=cache_dir, offline=offline, compact=compact)
+    df_clean = raw.dropna()
+    if snap is not None:
+        write_snapshot(df_clean, snap)
+    return df_clean if columns is None else df_clean[list(columns)]
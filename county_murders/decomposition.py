@@ -0,0 +1,120 @@
+"""
+Truncated and out-of-core PCA solvers for STEP 6.
+
+STEP 6 only reports the top few components, yet a full ``PCA()`` computes
+all of them from the whole scaled matrix.  Two cheaper routes:
+
+* ``solver='randomized'`` (artifacts.fit_pca with ``svd_solver=
+  'randomized'``) finds only ``n_components`` with a randomized
+  truncated SVD (Halko et al.), whose cost grows with k instead of the
+  number of variables.
+* streaming_pca() never holds the scaled matrix: like
+  clustering.streaming_kmeans() it takes chunks from data.iter_chunks(),
+  fits the scaler in a first pass and IncrementalPCA in a second, so peak
+  memory is one chunk.
+
+compare_pca() reports how closely either agrees with the exact solver.
+
+For a tall, narrow matrix like this panel (many rows, 10 variables) the
+exact solver scikit-learn picks by default (an eigendecomposition of the
+10 x 10 covariance matrix) is already cheaper than the randomized SVD,
+which makes several passes over the rows; the randomized solver pays off
+once the variables number in the thousands.  The incremental solver is
+the one that bounds memory on long panels.
+"""
+
+import numpy as np
+from county_murders.lazy import lazy_import
+
+sk_decomposition = lazy_import('sklearn.decomposition')
+sk_preprocessing = lazy_import('sklearn.preprocessing')
+
+SOLVERS = ('full', 'randomized', 'incremental')
+
+
+def _batches(read_chunks, columns, batch_size):
+    """Re-cut a stream of chunks into float64 batches of ``batch_size`` rows.
+
+    The last batch may be shorter; it is merged into the previous one when
+    it would be too small for IncrementalPCA.
+    """
+    pending, size = [], 0
+    for chunk in read_chunks():
+        rows = chunk[columns].to_numpy(dtype=np.float64)
+        if not len(rows):
+            continue
+        pending.append(rows)
+        size += len(rows)
+        while size >= 2 * batch_size:
+            rows = np.concatenate(pending)
+            yield rows[:batch_size]
+            pending, size = [rows[batch_size:]], size - batch_size
+    if pending:
+        yield np.concatenate(pending)
+
+
+def streaming_pca(read_chunks, columns, n_components=None, batch_size=10_000):
+    """Fit a scaler and IncrementalPCA from a stream of chunks.
+
+    Parameters
+    ----------
+    read_chunks : callable
+        Zero-argument callable returning a fresh iterator of DataFrames,
+        e.g. ``lambda: data.iter_chunks(chunksize=500_000, columns=pca_vars)``.
+        It is called twice (scaler pass, PCA pass).
+    columns : list of str
+        Feature columns (e.g. ``pca_vars``).
+    n_components : int, optional
+        Components to keep (default: all).
+    batch_size : int
+        Rows per IncrementalPCA update; at least ``n_components``.
+
+    Returns
+    -------
+    (scaler, pca) fitted like ``StandardScaler().fit(X)`` and
+    ``PCA(n_components).fit(scaler.transform(X))``.
+    """
+    columns = list(columns)
+    n_components = len(columns) if n_components is None else n_components
+    batch_size = max(batch_size, n_components)
+    scaler = sk_preprocessing.StandardScaler()
+    for chunk in read_chunks():
+        rows = chunk[columns].to_numpy(dtype=np.float64)
+        if len(rows):
+            scaler.partial_fit(rows)
+    if not getattr(scaler, 'n_samples_seen_', 0):
+        raise ValueError("no rows to fit the PCA on")
+
+    pca = sk_decomposition.IncrementalPCA(n_components=n_components)
+    for rows in _batches(read_chunks, columns, batch_size):
+        pca.partial_fit(scaler.transform(rows))
+    return scaler, pca
+
+
+def frame_chunks(df, chunksize=100_000):
+    """``read_chunks`` callable over an in-memory DataFrame."""
+    return lambda: (df.iloc[start:start + chunksize] for start in range(0, len(df), chunksize))
+
+
+def compare_pca(reference, candidate):
+    """Agreement of a truncated/incremental PCA with the exact solver.
+
+    Both arguments are fitted PCA-like models on the same standardized
+    variables.  Returns a dict with the number of compared components, the
+    largest absolute differences of the explained-variance ratios and of
+    their cumulative sums, and the smallest ``|cos|`` between matching
+    component directions (1.0 means identical up to sign).
+    """
+    k = min(len(reference.explained_variance_ratio_), len(candidate.explained_variance_ratio_))
+    ref_ratio = reference.explained_variance_ratio_[:k]
+    cand_ratio = candidate.explained_variance_ratio_[:k]
+    ref_vectors = reference.components_[:k]
+    cand_vectors = candidate.components_[:k]
+    cosines = np.abs((ref_vectors * cand_vectors).sum(axis=1)
+                     / (np.linalg.norm(ref_vectors, axis=1) * np.linalg.norm(cand_vectors, axis=1)))
+    return {
+        'components': k,
+        'max_ratio_error': float(np.abs(ref_ratio - cand_ratio).max()),
+        'max_cumulative_error': float(np.abs(np.cumsum(ref_ratio) - np.cumsum(cand_ratio)).max()),
+        'min_abs_cosine': float(cosines.min()),
+    }
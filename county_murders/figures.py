@@ -0,0 +1,491 @@
+"""
+Figure renderers for create_visualizations.py.
+
+Every figure is a function that takes a small dict of precomputed data
+and draws onto the current pyplot figure.  render_figures() runs them as
+independent tasks on a process pool (Agg backend) so the PNG
+rasterisation and encoding at dpi=300 happen in parallel.
+
+Rebuilds are incremental: each rendered file's fingerprint (its input
+data, the source of its renderer and of the shared helpers it lists in
+FIGURES, dpi and matplotlib version) is stored
+in ``<out_dir>/.fingerprints.json`` and figures whose fingerprint and
+output file are unchanged are skipped unless ``force=True``.
+
+Scatter plots 4, 7 and 8 switch to a density mode above
+DENSITY_THRESHOLD rows: build_figure_data() bins the points into a fixed
+grid (row counts, the mean colour value or the dominant cluster per bin)
+and the renderer draws that grid, so render time, worker payload and
+file size are bounded by the grid size rather than the row count.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+# Non-interactive backend: figures are only ever written to files
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import seaborn as sns  # noqa: E402
+
+from county_murders.analysis import (CLUSTER_VARS, PCA_VARS, correlation_moments,  # noqa: E402
+                                     correlations, summaries)
+from county_murders.artifacts import fit_elbow, fit_kmeans, fit_pca, fit_scaler  # noqa: E402
+from county_murders.instrument import measure  # noqa: E402
+from county_murders.parallel import map_tasks  # noqa: E402
+
+# Rows above which plots 4, 7 and 8 are drawn as binned density grids
+DENSITY_THRESHOLD = 100_000
+# Bins along x and y of the density grids (about one bin per 10 pixels at dpi=300)
+DENSITY_BINS = (300, 180)
+
+
+def density_grid(x, y, weights=None, bins=DENSITY_BINS):
+    """Bin ``(x, y)`` into a 2D histogram.
+
+    Returns a dict with ``counts`` (rows per bin, shape ``bins``), the bin
+    ``xedges``/``yedges`` and, when ``weights`` is given, ``means``: the
+    mean weight per bin (NaN where empty).
+    """
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    counts, xedges, yedges = np.histogram2d(x, y, bins=bins)
+    grid = {'counts': counts, 'xedges': xedges, 'yedges': yedges}
+    if weights is not None:
+        totals, _, _ = np.histogram2d(x, y, bins=[xedges, yedges],
+                                      weights=np.asarray(weights, dtype=np.float64))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grid['means'] = np.where(counts > 0, totals / counts, np.nan)
+    return grid
+
+
+def _dominant_cluster(x, y, clusters, bins=DENSITY_BINS):
+    """Density grid whose ``means`` hold the most frequent cluster per bin."""
+    grid = density_grid(x, y, bins=bins)
+    edges = [grid['xedges'], grid['yedges']]
+    per_cluster = np.stack([np.histogram2d(x[clusters == k], y[clusters == k], bins=edges)[0]
+                            for k in range(int(clusters.max()) + 1)])
+    grid['means'] = np.where(grid['counts'] > 0, per_cluster.argmax(axis=0), np.nan)
+    return grid
+
+
+def _draw_grid(grid, values, **kwargs):
+    """pcolormesh of a density grid (x along the first axis), empty bins blank."""
+    masked = np.ma.masked_invalid(np.where(grid['counts'] > 0, values, np.nan)).T
+    return plt.pcolormesh(grid['xedges'], grid['yedges'], masked, shading='flat', **kwargs)
+
+
+def murder_trends(d):
+    plt.figure(figsize=(12, 6))
+    yearly_data = d['yearly_murders']
+    plt.plot(yearly_data.index, yearly_data.values, marker='o', linewidth=2, markersize=8)
+    plt.title('Total Murders Over Time (1980-1996)', fontsize=16, fontweight='bold')
+    plt.xlabel('Year', fontsize=12)
+    plt.ylabel('Total Murders', fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+def murdrate_distribution(d):
+    plt.figure(figsize=(10, 6))
+    plt.hist(d['murdrate'], bins=50, edgecolor='black', alpha=0.7)
+    plt.title('Distribution of Murder Rates', fontsize=16, fontweight='bold')
+    plt.xlabel('Murder Rate', fontsize=12)
+    plt.ylabel('Frequency', fontsize=12)
+    mean = d['murdrate'].mean()
+    plt.axvline(mean, color='red', linestyle='--', linewidth=2, label=f'Mean: {mean:.2f}')
+    plt.legend()
+    plt.tight_layout()
+
+
+def correlation_heatmap(d):
+    plt.figure(figsize=(12, 10))
+    sns.heatmap(d['corr_matrix'], annot=True, fmt='.2f', cmap='coolwarm', center=0,
+                square=True, linewidths=1, cbar_kws={"shrink": 0.8})
+    plt.title('Correlation Heatmap - Key Variables', fontsize=16, fontweight='bold')
+    plt.tight_layout()
+
+
+def unemployment_vs_murders(d):
+    plt.figure(figsize=(10, 6))
+    if 'grid' in d:
+        grid = d['grid']
+        _draw_grid(grid, grid['counts'], cmap='Blues', norm=matplotlib.colors.LogNorm())
+        plt.colorbar(label='County-years per bin')
+        x = grid['xedges'][[0, -1]]
+        p = np.poly1d(d['trend'])
+    else:
+        x, y = d['rpcunemins'], d['murdrate']
+        plt.scatter(x, y, alpha=0.5, s=30)
+        p = np.poly1d(np.polyfit(x, y, 1))
+    plt.plot(x, p(x), "r--", linewidth=2, label='Trend Line')
+    plt.title('Unemployment vs Murder Rate', fontsize=16, fontweight='bold')
+    plt.xlabel('Per Capita Unemployment Insurance', fontsize=12)
+    plt.ylabel('Murder Rate', fontsize=12)
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+def murdrate_by_state(d):
+    plt.figure(figsize=(14, 6))
+    d['frame'].boxplot(column='murdrate', by='statefips', figsize=(14, 6))
+    plt.title('Murder Rate Distribution by State', fontsize=16, fontweight='bold')
+    plt.suptitle('')  # Remove default title
+    plt.xlabel('State FIPS Code', fontsize=12)
+    plt.ylabel('Murder Rate', fontsize=12)
+    plt.tight_layout()
+
+
+def top10_counties(d):
+    plt.figure(figsize=(12, 6))
+    d['top_counties'].plot(kind='bar', color='crimson')
+    plt.title('Top 10 Counties by Total Murders (1980-1996)', fontsize=16, fontweight='bold')
+    plt.xlabel('County ID', fontsize=12)
+    plt.ylabel('Total Murders', fontsize=12)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+
+def density_vs_murdrate(d):
+    plt.figure(figsize=(10, 6))
+    if 'grid' in d:
+        _draw_grid(d['grid'], d['grid']['means'], cmap='viridis')
+        plt.colorbar(label='% Black Population (bin mean)')
+    else:
+        plt.scatter(d['density'], d['murdrate'], alpha=0.5, s=30, c=d['percblack'], cmap='viridis')
+        plt.colorbar(label='% Black Population')
+    plt.title('Population Density vs Murder Rate', fontsize=16, fontweight='bold')
+    plt.xlabel('Population Density', fontsize=12)
+    plt.ylabel('Murder Rate', fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+def kmeans_clusters(d):
+    centers, ratio = d['centers_2d'], d['explained_variance_ratio']
+    plt.figure(figsize=(10, 8))
+    if 'grid' in d:
+        # Colour of each bin: its most frequent cluster
+        scatter = _draw_grid(d['grid'], d['grid']['means'], cmap='viridis')
+    else:
+        X_pca = d['X_pca']
+        scatter = plt.scatter(X_pca[:, 0], X_pca[:, 1], c=d['clusters'], cmap='viridis',
+                              s=50, alpha=0.6)
+    plt.scatter(centers[:, 0], centers[:, 1],
+                marker='X', s=300, c='red', edgecolor='black', linewidth=2, label='Centroids')
+    plt.title('K-Means Clustering (4 Clusters) - PCA Visualization', fontsize=16, fontweight='bold')
+    plt.xlabel(f'PC1 ({ratio[0]*100:.1f}% variance)', fontsize=12)
+    plt.ylabel(f'PC2 ({ratio[1]*100:.1f}% variance)', fontsize=12)
+    plt.colorbar(scatter, label='Cluster')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+def elbow_method(d):
+    K_range = d['K_range']
+    plt.figure(figsize=(10, 6))
+    plt.plot(K_range, d['inertias'], marker='o', linewidth=2, markersize=8)
+    plt.title('Elbow Method for Optimal K', fontsize=16, fontweight='bold')
+    plt.xlabel('Number of Clusters (K)', fontsize=12)
+    plt.ylabel('Inertia (Within-Cluster Sum of Squares)', fontsize=12)
+    plt.xticks(K_range)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+def pca_scree_plot(d):
+    ratio = d['explained_variance_ratio']
+    components = range(1, len(ratio) + 1)
+    plt.figure(figsize=(12, 6))
+    plt.subplot(1, 2, 1)
+    plt.bar(components, ratio * 100)
+    plt.title('Scree Plot - Explained Variance', fontsize=14, fontweight='bold')
+    plt.xlabel('Principal Component', fontsize=11)
+    plt.ylabel('Variance Explained (%)', fontsize=11)
+    plt.xticks(components)
+
+    plt.subplot(1, 2, 2)
+    plt.plot(components, np.cumsum(ratio) * 100, marker='o', linewidth=2)
+    plt.title('Cumulative Variance Explained', fontsize=14, fontweight='bold')
+    plt.xlabel('Number of Components', fontsize=11)
+    plt.ylabel('Cumulative Variance (%)', fontsize=11)
+    plt.axhline(y=80, color='r', linestyle='--', label='80% threshold')
+    plt.legend()
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+def arrests_vs_murders_time(d):
+    yearly_arrests, yearly_murders = d['yearly_arrests'], d['yearly_murders']
+    fig, ax1 = plt.subplots(figsize=(12, 6))
+    ax1.plot(yearly_arrests.index, yearly_arrests.values, 'b-o', label='Arrests', linewidth=2)
+    ax1.set_xlabel('Year', fontsize=12)
+    ax1.set_ylabel('Total Arrests', fontsize=12, color='b')
+    ax1.tick_params(axis='y', labelcolor='b')
+
+    ax2 = ax1.twinx()
+    ax2.plot(yearly_murders.index, yearly_murders.values, 'r-s', label='Murders', linewidth=2)
+    ax2.set_ylabel('Total Murders', fontsize=12, color='r')
+    ax2.tick_params(axis='y', labelcolor='r')
+
+    plt.title('Arrests vs Murders Over Time', fontsize=16, fontweight='bold')
+    fig.legend(loc='upper left', bbox_to_anchor=(0.12, 0.88))
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+
+
+# Shared drawing code of the density-grid scatter plots (figures 4, 7 and 8)
+_GRID = (_draw_grid, density_grid, DENSITY_BINS, DENSITY_THRESHOLD)
+
+# Output file name -> (renderer, message printed once the file is written,
+# shared helpers and constants the figure depends on besides its renderer)
+FIGURES = {
+    '01_murder_trends.png': (murder_trends, "Murder trends plot created", ()),
+    '02_murdrate_distribution.png': (murdrate_distribution, "Murder rate distribution plot created", ()),
+    '03_correlation_heatmap.png': (correlation_heatmap, "Correlation heatmap created", ()),
+    '04_unemployment_vs_murders.png': (unemployment_vs_murders, "Unemployment vs murder rate scatter plot created", _GRID),
+    '05_murdrate_by_state.png': (murdrate_by_state, "Murder rate by state box plot created", ()),
+    '06_top10_counties.png': (top10_counties, "Top 10 counties bar chart created", ()),
+    '07_density_vs_murdrate.png': (density_vs_murdrate, "Density vs murder rate scatter plot created", _GRID),
+    '08_kmeans_clusters.png': (kmeans_clusters, "K-means clustering visualization created", _GRID + (_dominant_cluster,)),
+    '09_elbow_method.png': (elbow_method, "Elbow method plot created", ()),
+    '10_pca_scree_plot.png': (pca_scree_plot, "PCA scree plot created", ()),
+    '11_arrests_vs_murders_time.png': (arrests_vs_murders_time, "Arrests vs murders time series created", ()),
+}
+
+
+def build_figure_data(df_clean, cache_dir=None, names=None, density_threshold=DENSITY_THRESHOLD,
+                      moments=None):
+    """Precompute the data for every figure from the cleaned table.
+
+    Returns ``{file name: data dict}``; render_figures() hands each task
+    only its own entry.  Model fits go through the artifact store.
+    ``names`` restricts the work to a subset of FIGURES (the KMeans and
+    elbow fits, for example, are skipped unless figure 8 or 9 is asked
+    for).  With more than ``density_threshold`` rows, plots 4, 7 and 8
+    get binned density grids instead of the individual points.
+    ``moments`` is an analysis.correlation_moments() accumulator to reuse
+    for the figure 3 heatmap.
+    """
+    dense = len(df_clean) > density_threshold
+    names = set(FIGURES if names is None else names)
+    unknown = names - set(FIGURES)
+    if unknown:
+        raise ValueError(f"unknown figures: {sorted(unknown)}")
+    figure_data = {}
+
+    # Yearly and per-county totals for figures 1, 6 and 11 come from one
+    # aggregation pass per key
+    if names & {'01_murder_trends.png', '06_top10_counties.png',
+                '11_arrests_vs_murders_time.png'}:
+        agg = summaries(df_clean, {'year': ['murders', 'arrests'], 'countyid': ['murders']})
+
+    # 1. MURDER TRENDS OVER TIME
+    if names & {'01_murder_trends.png', '11_arrests_vs_murders_time.png'}:
+        yearly_murders = agg['year'].sum('murders')
+    if '01_murder_trends.png' in names:
+        figure_data['01_murder_trends.png'] = {'yearly_murders': yearly_murders}
+
+    # 2. MURDER RATE DISTRIBUTION
+    if '02_murdrate_distribution.png' in names:
+        figure_data['02_murdrate_distribution.png'] = {'murdrate': df_clean['murdrate']}
+
+    # 3. CORRELATION HEATMAP
+    if '03_correlation_heatmap.png' in names:
+        if moments is None:
+            moments = correlation_moments(df_clean)
+        figure_data['03_correlation_heatmap.png'] = {
+            'corr_matrix': correlations(df_clean, PCA_VARS, moments)}
+
+    # 4. SCATTER: UNEMPLOYMENT VS MURDER RATE
+    if '04_unemployment_vs_murders.png' in names:
+        x, y = df_clean['rpcunemins'], df_clean['murdrate']
+        if dense:
+            figure_data['04_unemployment_vs_murders.png'] = {
+                'grid': density_grid(x, y), 'trend': np.polyfit(x, y, 1)}
+        else:
+            figure_data['04_unemployment_vs_murders.png'] = {'rpcunemins': x, 'murdrate': y}
+
+    # 5. BOX PLOT: MURDER RATE BY STATE
+    if '05_murdrate_by_state.png' in names:
+        figure_data['05_murdrate_by_state.png'] = {'frame': df_clean[['murdrate', 'statefips']]}
+
+    # 6. BAR CHART: TOP 10 COUNTIES BY MURDERS
+    if '06_top10_counties.png' in names:
+        top_counties = agg['countyid'].sum('murders').nlargest(10)
+        figure_data['06_top10_counties.png'] = {'top_counties': top_counties}
+
+    # 7. SCATTER: POPULATION DENSITY VS MURDER RATE
+    if '07_density_vs_murdrate.png' in names:
+        if dense:
+            figure_data['07_density_vs_murdrate.png'] = {'grid': density_grid(
+                df_clean['density'], df_clean['murdrate'], weights=df_clean['percblack'])}
+        else:
+            figure_data['07_density_vs_murdrate.png'] = {
+                'density': df_clean['density'], 'murdrate': df_clean['murdrate'],
+                'percblack': df_clean['percblack']}
+
+    # 8. K-MEANS CLUSTERING VISUALIZATION
+    if names & {'08_kmeans_clusters.png', '09_elbow_method.png'}:
+        X_cluster = df_clean[CLUSTER_VARS].dropna()
+        # (scaler/KMeans/PCA fits are shared with county_murders_analysis.py)
+        scaler, X_scaled = fit_scaler(X_cluster, cache_dir=cache_dir)
+    if '08_kmeans_clusters.png' in names:
+        kmeans, clusters = fit_kmeans(X_scaled, n_clusters=4, random_state=42, n_init=10,
+                                      cache_dir=cache_dir)
+
+        pca_2d, X_pca = fit_pca(X_scaled, n_components=2, cache_dir=cache_dir)
+        figure_data['08_kmeans_clusters.png'] = {
+            'centers_2d': pca_2d.transform(kmeans.cluster_centers_),
+            'explained_variance_ratio': pca_2d.explained_variance_ratio_}
+        if len(X_pca) > density_threshold:
+            figure_data['08_kmeans_clusters.png']['grid'] = _dominant_cluster(
+                X_pca[:, 0], X_pca[:, 1], clusters)
+        else:
+            figure_data['08_kmeans_clusters.png'].update(X_pca=X_pca, clusters=clusters)
+
+    # 9. ELBOW METHOD FOR OPTIMAL K
+    if '09_elbow_method.png' in names:
+        K_range = range(2, 11)
+        elbow = fit_elbow(X_scaled, K_range, n_init=10, random_state=42, cache_dir=cache_dir)
+        figure_data['09_elbow_method.png'] = {'K_range': K_range,
+                                              'inertias': elbow['inertia'].tolist()}
+
+    # 10. PCA SCREE PLOT
+    if '10_pca_scree_plot.png' in names:
+        X_pca_full = df_clean[PCA_VARS].dropna()
+        pca_scaler, X_pca_scaled = fit_scaler(X_pca_full, cache_dir=cache_dir)
+        pca_full, _ = fit_pca(X_pca_scaled, cache_dir=cache_dir)
+        figure_data['10_pca_scree_plot.png'] = {
+            'explained_variance_ratio': pca_full.explained_variance_ratio_}
+
+    # 11. TIME SERIES: ARRESTS VS MURDERS
+    if '11_arrests_vs_murders_time.png' in names:
+        figure_data['11_arrests_vs_murders_time.png'] = {
+            'yearly_arrests': agg['year'].sum('arrests'),
+            'yearly_murders': yearly_murders}
+
+    return figure_data
+
+
+MANIFEST = '.fingerprints.json'
+
+
+def _hash_value(h, value):
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        h.update(repr((type(value).__name__, getattr(value, 'name', None),
+                       list(map(str, getattr(value, 'columns', []))),
+                       str(getattr(value, 'dtypes', getattr(value, 'dtype', None))))).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        h.update(f'{value.dtype.str}{value.shape}'.encode())
+        h.update(value.tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            h.update(repr(key).encode())
+            _hash_value(h, value[key])
+    else:
+        h.update(repr(value).encode())
+
+
+def figure_fingerprint(name, data, dpi):
+    """Fingerprint of one figure's inputs and plotting code.
+
+    The code is the figure's renderer, the helpers and constants listed
+    for it in FIGURES and the saving step, so editing one renderer only
+    invalidates its own figure.
+    """
+    renderer, _, dependencies = FIGURES[name]
+    h = hashlib.sha256()
+    h.update(f'{name}|{dpi}|{matplotlib.__version__}|'.encode())
+    for code in (renderer, _draw_and_save) + tuple(dependencies):
+        h.update((inspect.getsource(code) if callable(code) else repr(code)).encode())
+    _hash_value(h, data)
+    return h.hexdigest()
+
+
+def _read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _up_to_date(entry, path, fingerprint):
+    if not entry or entry.get('fingerprint') != fingerprint:
+        return False
+    try:
+        return os.path.getsize(path) == entry['size']
+    except OSError:
+        return False
+
+
+def _draw_and_save(name, data, path, dpi):
+    FIGURES[name][0](data)
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close('all')
+
+
+def _render(task):
+    name, data, path, dpi, trace_memory, profile_path = task
+    _, metrics = measure(_draw_and_save, name, data, path, dpi,
+                         trace_memory=trace_memory, profile_path=profile_path)
+    return name, path, metrics
+
+
+def render_figures(figure_data, out_dir='visualizations', dpi=300, n_jobs=None, force=False,
+                   trace_memory=False, profile_dir=None):
+    """Render out-of-date figures on a process pool.
+
+    Parameters
+    ----------
+    figure_data : dict
+        File name (a key of FIGURES) -> data dict for its renderer.  Each
+        task is sent only its own data.
+    force : bool
+        Rebuild every figure, ignoring stored fingerprints.
+    trace_memory : bool
+        Trace peak allocations of each render (see instrument.py).
+    profile_dir : str, optional
+        Write a cProfile capture of each render to
+        ``<profile_dir>/figure.<name>.prof``.
+
+    Returns
+    -------
+    List of ``(name, path, metrics)`` in FIGURES order, where ``metrics``
+    holds the render's wall/CPU time and memory as measured in its worker,
+    or None for figures skipped as up to date.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    fingerprints = {}
+    tasks = []
+    for name in FIGURES:
+        if name not in figure_data:
+            continue
+        path = os.path.join(out_dir, name)
+        fingerprints[name] = figure_fingerprint(name, figure_data[name], dpi)
+        if force or not _up_to_date(manifest.get(name), path, fingerprints[name]):
+            profile_path = None if profile_dir is None else os.path.join(profile_dir, f'figure.{name}.prof')
+            tasks.append((name, figure_data[name], path, dpi, trace_memory, profile_path))
+
+    rendered = {result[0]: result for result in map_tasks(_render, tasks, n_jobs)}
+    for name in rendered:
+        manifest[name] = {'fingerprint': fingerprints[name],
+                          'size': os.path.getsize(rendered[name][1])}
+    if rendered:
+        tmp = os.path.join(out_dir, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp, os.path.join(out_dir, MANIFEST))
+
+    return [rendered.get(name, (name, os.path.join(out_dir, name), None))
+            for name in fingerprints]
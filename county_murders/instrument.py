@@ -0,0 +1,246 @@
+"""
+Per-stage timing and memory instrumentation.
+
+A Profiler records, for every named stage of a run:
+
+    wall_s          elapsed wall-clock time
+    cpu_s           CPU time of this process
+    peak_traced_mb  peak Python/NumPy allocations above the stage's start
+                    (tracemalloc, when trace_memory=True; tracing slows
+                    allocation-heavy stages such as figure rendering)
+    rss_delta_mb    change in resident set size
+
+and optionally a cProfile capture per stage (``<name>.prof`` plus the top
+functions by cumulative time in the report).  finish() writes everything
+as one JSON report.
+
+The scripts configure it from the environment (Profiler.from_env):
+
+    COUNTY_MURDERS_REPORT_DIR   where reports go (default: reports/)
+    COUNTY_MURDERS_TRACEMALLOC  1 enables allocation tracing (off by default)
+    COUNTY_MURDERS_CPROFILE     1 enables cProfile per stage
+"""
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import re
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def rss_bytes():
+    """Current resident set size, or None where it cannot be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+
+# Measurements running in this process, innermost last
+_ACTIVE = []
+
+
+def _forget_parent_measurements():
+    # A forked worker inherits the parent's open measurements and its
+    # enabled profiler; they belong to the parent, so drop them here
+    for m in _ACTIVE:
+        if m.profiler:
+            m.profiler.disable()
+    _ACTIVE.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_parent_measurements)
+
+
+class _Measurement:
+    """Counters for one stage; ``stop()`` returns the metrics dict.
+
+    Measurements nest (e.g. per-figure renders run in-process inside the
+    "Render figures" step): an inner one never resets the outer one's
+    traced peak, and while an outer cProfile capture is running the inner
+    one does not start its own (only one profiler can be active), so the
+    outer capture keeps every call.
+    """
+
+    def __init__(self, trace_memory=True, profile=False):
+        self.trace_memory = trace_memory
+        self.started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+        # Highest traced size seen before a tracemalloc.reset_peak() by a
+        # nested measurement
+        self.carried_peak = 0
+        if trace_memory:
+            for outer in _ACTIVE:
+                if outer.trace_memory:
+                    outer.carried_peak = max(outer.carried_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.traced_start = tracemalloc.get_traced_memory()[0]
+        profiling = any(outer.profiler for outer in _ACTIVE)
+        self.profiler = cProfile.Profile() if profile and not profiling else None
+        self.rss_start = rss_bytes()
+        _ACTIVE.append(self)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        if self.profiler:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler:
+            self.profiler.disable()
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        if self in _ACTIVE:
+            _ACTIVE.remove(self)
+        peak = None
+        if self.trace_memory:
+            traced_peak = max(self.carried_peak, tracemalloc.get_traced_memory()[1])
+            peak = (traced_peak - self.traced_start) / 1024 ** 2
+            for outer in _ACTIVE:
+                outer.carried_peak = max(outer.carried_peak, traced_peak)
+            if self.started_tracing:
+                tracemalloc.stop()
+        rss_end = rss_bytes()
+        return {
+            'wall_s': wall,
+            'cpu_s': cpu,
+            'peak_traced_mb': peak,
+            'rss_delta_mb': None if self.rss_start is None or rss_end is None
+            else (rss_end - self.rss_start) / 1024 ** 2,
+        }
+
+
+def _top_functions(profiler, limit=15):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue().splitlines()
+
+
+def _save_profile(profiler, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    profiler.dump_stats(path)
+    return {'file': path, 'top': _top_functions(profiler)}
+
+
+def measure(func, *args, trace_memory=True, profile_path=None, **kwargs):
+    """Run ``func(*args, **kwargs)``; returns ``(result, metrics dict)``.
+
+    With ``profile_path`` a cProfile capture is written there and
+    summarised under ``metrics['cprofile']``, unless an enclosing
+    measurement is already profiling (its capture includes this call).
+    """
+    m = _Measurement(trace_memory, profile=profile_path is not None)
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        metrics = m.stop()
+    if m.profiler is not None:
+        metrics['cprofile'] = _save_profile(m.profiler, profile_path)
+    return result, metrics
+
+
+class Profiler:
+    """Collects per-stage metrics for one run.
+
+    Stages can be wrapped in ``with profiler.stage(name):`` or, for flat
+    scripts, marked with ``profiler.step(name)``, which ends the previous
+    step and starts the next one.
+    """
+
+    def __init__(self, name, trace_memory=True, cprofile=False, report_dir='reports'):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.cprofile = cprofile
+        self.report_dir = report_dir
+        self.stages = []
+        self._current = None
+        self._started = time.time()
+        self._wall = time.perf_counter()
+
+    @classmethod
+    def from_env(cls, name):
+        return cls(name,
+                   trace_memory=os.environ.get('COUNTY_MURDERS_TRACEMALLOC', '0') == '1',
+                   cprofile=os.environ.get('COUNTY_MURDERS_CPROFILE', '0') == '1',
+                   report_dir=os.environ.get('COUNTY_MURDERS_REPORT_DIR', 'reports'))
+
+    def _slug(self, stage):
+        return re.sub(r'[^A-Za-z0-9]+', '_', stage).strip('_').lower()
+
+    def profile_path(self, stage):
+        """Where the cProfile capture of ``stage`` is written."""
+        return os.path.join(self.report_dir, f'{self.name}.{self._slug(stage)}.prof')
+
+    def _close(self, stage, measurement):
+        entry = dict(stage=stage, **measurement.stop())
+        if measurement.profiler:
+            entry['cprofile'] = _save_profile(measurement.profiler, self.profile_path(stage))
+        self.stages.append(entry)
+        return entry
+
+    @contextmanager
+    def stage(self, name):
+        self.end_step()
+        m = _Measurement(self.trace_memory, self.cprofile)
+        try:
+            yield
+        finally:
+            self._close(name, m)
+
+    def step(self, name):
+        """End the current step (if any) and start ``name``."""
+        self.end_step()
+        self._current = (name, _Measurement(self.trace_memory, self.cprofile))
+
+    def end_step(self):
+        if self._current is not None:
+            name, m = self._current
+            self._current = None
+            return self._close(name, m)
+
+    def add(self, stage, metrics):
+        """Record metrics measured elsewhere (e.g. in a worker process)."""
+        self.stages.append(dict(stage=stage, **metrics))
+
+    def report(self):
+        return {
+            'run': self.name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self._started)),
+            'total_wall_s': time.perf_counter() - self._wall,
+            'python': platform.python_version(),
+            'argv': sys.argv,
+            'trace_memory': self.trace_memory,
+            'cprofile': self.cprofile,
+            'stages': self.stages,
+        }
+
+    def finish(self):
+        """End the current step and write ``<report_dir>/<name>.json``."""
+        self.end_step()
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f'{self.name}.json')
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def summary(self):
+        """One line per stage, for printing at the end of a run."""
+        lines = []
+        for s in self.stages:
+            peak = s.get('peak_traced_mb')
+            lines.append(f"{s['stage']:<45} {s['wall_s']:8.3f}s wall {s['cpu_s']:8.3f}s cpu"
+                         + (f" {peak:9.1f} MB peak" if peak is not None else ""))
+        return '\n'.join(lines)
@@ -0,0 +1,38 @@
+"""
+Deferred imports for heavy optional-at-startup dependencies.
+
+``stats = lazy_import('scipy.stats')`` binds a placeholder module; the
+real import happens on the first attribute access (``stats.ttest_ind``).
+Modules of this package use it for scikit-learn, SciPy and joblib so
+that importing e.g. county_murders.analysis for descriptive statistics
+does not pay for the machine-learning stack.
+"""
+
+import importlib
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module placeholder that imports ``name`` on first attribute access."""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_module'] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name):
+    """Return a LazyModule for ``name`` (nothing is imported yet)."""
+    return LazyModule(name)
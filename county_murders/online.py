@@ -0,0 +1,290 @@
+"""
+One-pass, mergeable statistics over chunked input.
+
+STEP 1-3 need the whole table in memory for ``df.describe()``, the
+missing-value table and the murder statistics.  RunningStats gives the
+same numbers from a stream of chunks (data.iter_chunks()) in memory
+bounded by the chunk size, so multi-GB extracts can be profiled on a
+small machine:
+
+    raw, clean = stream_describe(chunksize=500_000)
+    raw.describe()             # count/mean/std/min/max like df.describe()
+    raw.missing_values()       # like analysis.missing_values(df)
+    clean.murder_statistics()  # like analysis.murder_statistics(df_clean)
+
+CoMoments does the same for correlation matrices (STEP 4, figure 3).
+
+Means and variances use Welford's update in its batched form (Chan et
+al.): each chunk's mean and centred sum of squares are computed with
+numpy and folded into the running totals, which is as stable as the
+per-value recurrence and lets two RunningStats be merged, e.g. from
+partitions processed in different processes.  With ``percentiles`` set,
+a QuantileSketch per column (sketches.py) fills describe()'s 25%/50%/75%
+rows approximately.
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.data import DATA_URL, iter_chunks
+from county_murders.sketches import QuantileSketch
+
+
+def _combine(count_a, mean_a, m2_a, count_b, mean_b, m2_b):
+    """Chan et al. pairwise update of (count, mean, M2); arrays broadcast."""
+    count = count_a + count_b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(count > 0, count_b / count, 0.0)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * weight
+    m2 = m2_a + m2_b + delta ** 2 * count_a * weight
+    return count, mean, m2
+
+
+class RunningStats:
+    """Per-column count, mean, M2, sum, min, max, null and zero counts.
+
+    Parameters
+    ----------
+    columns : list of str, optional
+        Columns to track; by default the numeric columns of the first
+        chunk.
+    percentiles : sequence of float, optional
+        Quantiles for describe() to estimate, e.g. ``(0.25, 0.5, 0.75)``.
+    """
+
+    def __init__(self, columns=None, percentiles=None):
+        self.columns = None if columns is None else list(columns)
+        self.percentiles = None if percentiles is None else list(percentiles)
+        self.rows = 0
+        if self.columns is not None:
+            self._allocate()
+
+    def _allocate(self):
+        n = len(self.columns)
+        self.count = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.total = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+        self.nulls = np.zeros(n, dtype=np.int64)
+        self.zeros = np.zeros(n, dtype=np.int64)
+        self.sketches = None
+        if self.percentiles is not None:
+            self.sketches = [QuantileSketch(seed=0) for _ in self.columns]
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the statistics."""
+        if self.columns is None:
+            self.columns = chunk.select_dtypes(include=[np.number]).columns.tolist()
+            self._allocate()
+        values = chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+
+        count = present.sum(axis=0).astype(np.float64)
+        total = filled.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(count > 0, total / count, 0.0)
+        m2 = (np.where(present, values - mean, 0.0) ** 2).sum(axis=0)
+        self.count, self.mean, self.m2 = _combine(self.count, self.mean, self.m2,
+                                                  count, mean, m2)
+        self.total += total
+        self.min = np.minimum(self.min, np.where(present, values, np.inf).min(axis=0, initial=np.inf))
+        self.max = np.maximum(self.max, np.where(present, values, -np.inf).max(axis=0, initial=-np.inf))
+        self.nulls += len(values) - present.sum(axis=0)
+        self.zeros += (values == 0).sum(axis=0)
+        self.rows += len(values)
+        if self.sketches is not None:
+            for j, sketch in enumerate(self.sketches):
+                sketch.update(values[:, j])
+        return self
+
+    def merge(self, other):
+        """Fold the statistics of another RunningStats over the same columns."""
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.columns = list(other.columns)
+            self._allocate()
+        if other.columns != self.columns:
+            raise ValueError("cannot merge RunningStats over different columns")
+        self.count, self.mean, self.m2 = _combine(self.count, self.mean, self.m2,
+                                                  other.count, other.mean, other.m2)
+        self.total += other.total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        self.nulls += other.nulls
+        self.zeros += other.zeros
+        self.rows += other.rows
+        if self.sketches is not None and other.sketches is not None:
+            for sketch, other_sketch in zip(self.sketches, other.sketches):
+                sketch.merge(other_sketch)
+        return self
+
+    def _series(self, values):
+        return pd.Series(values, index=self.columns)
+
+    def variance(self, ddof=1):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._series(np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan))
+
+    def describe(self):
+        """Rows of ``DataFrame.describe()``; quantile rows only with ``percentiles``."""
+        seen = self.count > 0
+        rows = {
+            'count': self.count,
+            'mean': np.where(seen, self.mean, np.nan),
+            'std': np.sqrt(self.variance().to_numpy()),
+            'min': np.where(seen, self.min, np.nan),
+        }
+        for q in self.percentiles if self.sketches is not None else ():
+            rows[f'{q * 100:g}%'] = [sketch.quantile(q) for sketch in self.sketches]
+        rows['max'] = np.where(seen, self.max, np.nan)
+        return pd.DataFrame(rows, index=self.columns).T
+
+    def missing_values(self):
+        """Missing count and percentage for the columns that have any."""
+        missing = self._series(self.nulls)
+        missing_df = pd.DataFrame({'Missing Count': missing,
+                                   'Percentage': (missing / self.rows) * 100})
+        return missing_df[missing_df['Missing Count'] > 0]
+
+    def murder_statistics(self, column='murders'):
+        """Total, mean and max of ``column`` and its zero count."""
+        j = self.columns.index(column)
+        return {
+            'total': self.total[j],
+            'mean': self.mean[j],
+            'max': self.max[j],
+            'zero_count': int(self.zeros[j]),
+        }
+
+
+class CoMoments:
+    """Pairwise co-moments of several columns, for Pearson correlations.
+
+    For every pair of columns (i, j) it keeps, over the rows where both
+    are present, the count ``n``, the mean of i (``mean[i, j]``), the
+    centred sum of squares of i (``m2[i, j]``) and the co-moment
+    ``c[i, j] = sum((x_i - mean_i)(x_j - mean_j))``.  Chunks are reduced
+    with a few matrix products and folded in with the pairwise
+    (Chan et al.) update, so corr() equals ``DataFrame.corr()`` -
+    including its pairwise-complete handling of missing values - for any
+    chunking, and accumulators from different partitions or processes can
+    be merged.  Memory is O(columns**2) regardless of the row count.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.n = np.zeros((p, p))
+        self.mean = np.zeros((p, p))
+        self.m2 = np.zeros((p, p))
+        self.c = np.zeros((p, p))
+
+    def _fold(self, n, mean, m2, c):
+        total = self.n + n
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(total > 0, n / total, 0.0)
+        delta = mean - self.mean
+        # delta[i, j] * delta[j, i]: shift of i and of j over the same rows
+        self.c = self.c + c + delta * delta.T * self.n * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * weight
+        self.mean = self.mean + delta * weight
+        self.n = total
+
+    def update(self, chunk):
+        """Fold one DataFrame chunk into the co-moments."""
+        return self.update_values(chunk[self.columns].to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def update_values(self, values):
+        """Fold a float64 array (rows x columns, NaN = missing) into the co-moments."""
+        present = ~np.isnan(values)
+        weights = present.astype(np.float64)
+        # Centre on the chunk's column means so the products below do not
+        # lose precision to large offsets (population, income)
+        count = weights.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift = np.where(count > 0, np.where(present, values, 0.0).sum(axis=0) / count, 0.0)
+        centred = np.where(present, values - shift, 0.0)
+
+        n = weights.T @ weights
+        sums = centred.T @ weights
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, sums / n, 0.0)
+        m2 = (centred ** 2).T @ weights - mean * sums
+        c = centred.T @ centred - mean * sums.T
+        self._fold(n, mean + shift[:, None], m2, c)
+        return self
+
+    def merge(self, other):
+        """Fold the co-moments of another accumulator over the same columns."""
+        if other.columns != self.columns:
+            raise ValueError("cannot merge CoMoments over different columns")
+        self._fold(other.n, other.mean, other.m2, other.c)
+        return self
+
+    def _select(self, matrix, columns):
+        frame = pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+        if columns is not None:
+            frame = frame.loc[list(columns), list(columns)]
+        return frame
+
+    def cov(self, columns=None, ddof=1):
+        """Covariance matrix (pairwise complete), like ``DataFrame.cov()``."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = np.where(self.n > ddof, self.c / (self.n - ddof), np.nan)
+        return self._select(cov, columns)
+
+    def corr_values(self):
+        """Pearson correlation matrix as an array over all columns."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = self.c / np.sqrt(self.m2 * self.m2.T)
+        return np.where(self.n > 1, np.clip(r, -1.0, 1.0), np.nan)
+
+    def corr(self, columns=None):
+        """Pearson correlation matrix, optionally of a subset of the columns."""
+        return self._select(self.corr_values(), columns)
+
+
+def comoments(df, columns, chunksize=None):
+    """CoMoments of ``columns`` of an in-memory table (optionally chunked)."""
+    moments = CoMoments(columns)
+    if chunksize is None:
+        return moments.update(df)
+    for start in range(0, len(df), chunksize):
+        moments.update(df.iloc[start:start + chunksize])
+    return moments
+
+
+def stream_correlations(columns, source=DATA_URL, chunksize=100_000, cache_dir=None,
+                        offline=None):
+    """CoMoments of ``columns`` over the cleaned dataset in one chunked pass."""
+    moments = CoMoments(columns)
+    for chunk in iter_chunks(source, chunksize=chunksize, columns=columns,
+                             cache_dir=cache_dir, offline=offline):
+        moments.update(chunk)
+    return moments
+
+
+def stream_describe(source=DATA_URL, chunksize=100_000, columns=None, cache_dir=None,
+                    offline=None, percentiles=(0.25, 0.5, 0.75)):
+    """Statistics of the raw table and of its ``dropna()`` in one chunked pass.
+
+    ``percentiles`` are estimated for the raw table only (``None`` skips
+    them).
+
+    Returns
+    -------
+    (raw, clean) : RunningStats
+        ``raw`` covers every row (STEP 1); ``clean`` only complete rows
+        (STEP 2-3).
+    """
+    raw, clean = RunningStats(columns, percentiles), RunningStats(columns)
+    for chunk in iter_chunks(source, chunksize=chunksize, dropna=False,
+                             cache_dir=cache_dir, offline=offline):
+        raw.update(chunk)
+        clean.update(chunk.dropna())
+    return raw, clean
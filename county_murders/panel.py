@@ -0,0 +1,256 @@
+"""
+Dense county x year panel arrays.
+
+The dataset is a county-year panel, but year-over-year changes (Query
+13), moving averages (Query 16), running totals (Query 17) and the
+pre/post-1988 split all go through groupby, self-joins or window
+functions.  Panel maps ``countyid`` and ``year`` to dense integer
+positions once and stores each metric as a C-contiguous ``(counties,
+years)`` float64 array, NaN where a county-year is missing (``mask`` marks
+the county-years present; repeated rows of a county-year are combined
+by from_frame()).  Years form a contiguous range, so a lag is a
+column shift and a county's series is one array row:
+
+    panel = Panel.from_frame(df_clean, ['murders', 'murdrate'])
+    panel.series('murdrate', 1001)            # one county, by position
+    change = panel.diff('murders')            # YoY change per county-year
+    panel.rolling_mean('murdrate', window=3)  # centred 3-year window
+    panel.cumsum('murders')                   # running total per county
+    pre, post = panel.split(1988)             # views, no copies
+    panel.by_state('murders')                 # state x year totals
+
+The window functions below also work on any array whose last axis is
+years, e.g. the yearly totals ``panel.total('murders').to_numpy()``.
+Missing cells are skipped by the windows and stay missing in the output.
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import _factorize
+from county_murders.data import DATA_URL, load_clean
+
+
+def lag(values, periods=1):
+    """Shift along the last (year) axis by ``periods``; vacated years are NaN."""
+    values = np.asarray(values, dtype=np.float64)
+    shifted = np.full_like(values, np.nan)
+    if periods > 0:
+        shifted[..., periods:] = values[..., :-periods]
+    elif periods < 0:
+        shifted[..., :periods] = values[..., -periods:]
+    else:
+        shifted[...] = values
+    return shifted
+
+
+def diff(values, periods=1):
+    """Change from ``periods`` years earlier (NaN where either year is missing)."""
+    return np.asarray(values, dtype=np.float64) - lag(values, periods)
+
+
+def pct_change(values, periods=1):
+    """Relative change from ``periods`` years earlier, like ``Series.pct_change()``."""
+    previous = lag(values, periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(values, dtype=np.float64) / previous - 1
+
+
+def rolling_mean(values, window=3, center=True, min_periods=1):
+    """Mean over a window of years, like ``rolling(window, center, min_periods).mean()``.
+
+    Computed from cumulative sums of the present values and of their
+    count, so the cost does not depend on ``window``.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    present = ~np.isnan(values)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    sums = np.cumsum(np.pad(np.where(present, values, 0.0), pad), axis=-1)
+    counts = np.cumsum(np.pad(present, pad), axis=-1)
+    n = values.shape[-1]
+    end = np.arange(1, n + 1) + ((window - 1) // 2 if center else 0)
+    start = np.clip(end - window, 0, n)
+    end = np.minimum(end, n)
+    total = sums[..., end] - sums[..., start]
+    count = counts[..., end] - counts[..., start]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(count >= min_periods, total / count, np.nan)
+    return np.where(present, mean, np.nan)
+
+
+def cumsum(values):
+    """Running total along years, skipping missing years."""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), np.nan, np.nancumsum(values, axis=-1))
+
+
+class Panel:
+    """Metrics of a county x year panel as dense ``(counties, years)`` arrays.
+
+    Parameters
+    ----------
+    counties : ndarray
+        Sorted county ids, one per array row.
+    years : ndarray
+        Contiguous range of years, one per array column.
+    values : dict
+        Metric -> float64 array of shape ``(len(counties), len(years))``.
+    mask : ndarray of bool
+        County-years present in the data.
+    states : ndarray, optional
+        statefips of every county.
+    counts : ndarray of int, optional
+        Source rows combined into each cell.
+    """
+
+    def __init__(self, counties, years, values, mask, states=None, counts=None):
+        self.counties = np.asarray(counties)
+        self.years = np.asarray(years)
+        self.values = dict(values)
+        self.mask = mask
+        self.states = states
+        self.counts = counts
+        self._rows = pd.Index(self.counties)
+
+    def __repr__(self):
+        return (f"Panel(counties={len(self.counties)}, years={self.years[0]}-{self.years[-1]}, "
+                f"metrics={list(self.values)})")
+
+    def __getitem__(self, metric):
+        return self.values[metric]
+
+    @property
+    def metrics(self):
+        return list(self.values)
+
+    @classmethod
+    def from_frame(cls, df, metrics, agg=None, county='countyid', year='year', state='statefips'):
+        """Build the panel from long county-year rows.
+
+        The extract can hold several rows for one county-year; they are
+        combined per metric by ``agg`` ('sum' or 'mean', or a dict of
+        them), by default summing integer counts (murders, popul) and
+        averaging float rates (murdrate).  ``counts`` holds the rows per
+        cell.
+        """
+        county_codes, counties = _factorize(df[county])
+        year_values = df[year].to_numpy().astype(np.int64)
+        first = int(year_values.min())
+        years = np.arange(first, int(year_values.max()) + 1)
+        shape = (len(counties), len(years))
+        cells = county_codes.astype(np.int64) * len(years) + (year_values - first)
+        size = shape[0] * shape[1]
+        counts = np.bincount(cells, minlength=size).reshape(shape)
+
+        values = {}
+        for metric in metrics:
+            how = agg.get(metric) if isinstance(agg, dict) else agg
+            if how is None:
+                how = 'sum' if df[metric].dtype.kind in 'iub' else 'mean'
+            if how not in ('sum', 'mean'):
+                raise ValueError(f"unknown aggregation {how!r} for {metric!r}; expected sum or mean")
+            column = df[metric].to_numpy(dtype=np.float64, na_value=np.nan)
+            present = ~np.isnan(column)
+            total = np.bincount(cells[present], weights=column[present], minlength=size)
+            n = np.bincount(cells[present], minlength=size)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                array = np.where(n > 0, total / n if how == 'mean' else total, np.nan)
+            values[metric] = array.reshape(shape)
+        states = None
+        if state in df:
+            states = np.zeros(len(counties), dtype=df[state].dtype)
+            states[county_codes] = df[state].to_numpy()
+        return cls(counties, years, values, counts > 0, states, counts)
+
+    def row(self, countyid):
+        """Array row of a county."""
+        return self._rows.get_loc(countyid)
+
+    def column(self, year):
+        """Array column of a year."""
+        return int(year - self.years[0])
+
+    def series(self, metric, countyid):
+        """One county's values by year."""
+        return pd.Series(self.values[metric][self.row(countyid)], index=self.years, name=metric)
+
+    def frame(self, values):
+        """Label a ``(counties, years)`` array as a DataFrame."""
+        return pd.DataFrame(values, index=pd.Index(self.counties, name='countyid'),
+                            columns=pd.Index(self.years, name='year'))
+
+    def long(self, values, name):
+        """The present cells of an array as a (countyid, year)-indexed Series."""
+        rows, cols = np.nonzero(self.mask)
+        index = pd.MultiIndex.from_arrays([self.counties[rows], self.years[cols]],
+                                          names=['countyid', 'year'])
+        return pd.Series(values[rows, cols], index=index, name=name)
+
+    def lag(self, metric, periods=1):
+        return lag(self.values[metric], periods)
+
+    def diff(self, metric, periods=1):
+        return diff(self.values[metric], periods)
+
+    def pct_change(self, metric, periods=1):
+        return pct_change(self.values[metric], periods)
+
+    def rolling_mean(self, metric, window=3, center=True, min_periods=1):
+        return rolling_mean(self.values[metric], window, center, min_periods)
+
+    def cumsum(self, metric):
+        return cumsum(self.values[metric])
+
+    def split(self, year):
+        """Panels before and from ``year`` on (views of the same arrays)."""
+        cut = min(max(self.column(year), 0), len(self.years))
+
+        def part(columns):
+            return Panel(self.counties, self.years[columns],
+                         {metric: array[:, columns] for metric, array in self.values.items()},
+                         self.mask[:, columns], self.states,
+                         None if self.counts is None else self.counts[:, columns])
+        return part(slice(None, cut)), part(slice(cut, None))
+
+    def present(self, metric):
+        """Flat array of the present, non-missing values of ``metric``."""
+        values = self.values[metric]
+        return values[self.mask & ~np.isnan(values)]
+
+    def total(self, metric):
+        """Sum of ``metric`` over counties for every year."""
+        values = self.values[metric]
+        totals = np.nansum(values, axis=0)
+        totals[~(self.mask & ~np.isnan(values)).any(axis=0)] = np.nan
+        return pd.Series(totals, index=pd.Index(self.years, name='year'), name=metric)
+
+    def mean(self, metric):
+        """Mean of the cells of ``metric`` in every year (one value per county)."""
+        values = self.values[metric]
+        counts = (~np.isnan(values)).sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.where(counts > 0, np.nansum(values, axis=0) / counts, np.nan)
+        return pd.Series(means, index=pd.Index(self.years, name='year'), name=metric)
+
+    def by_state(self, metric):
+        """State x year totals of ``metric`` (NaN where a state has no rows)."""
+        if self.states is None:
+            raise ValueError("the panel was built without a state column")
+        codes, states = _factorize(pd.Series(self.states))
+        values = self.values[metric]
+        present = ~np.isnan(values)
+        totals = np.zeros((len(states), len(self.years)))
+        counts = np.zeros((len(states), len(self.years)))
+        np.add.at(totals, codes, np.where(present, values, 0.0))
+        np.add.at(counts, codes, present)
+        totals[counts == 0] = np.nan
+        return pd.DataFrame(totals, index=pd.Index(states, name='statefips'),
+                            columns=pd.Index(self.years, name='year'))
+
+
+def load_panel(metrics=('murders', 'murdrate'), source=DATA_URL, cache_dir=None, offline=None):
+    """Panel of the cleaned dataset, reading only the columns it needs."""
+    metrics = list(metrics)
+    columns = list(dict.fromkeys(['countyid', 'year', 'statefips'] + metrics))
+    df_clean = load_clean(source, cache_dir=cache_dir, offline=offline, columns=columns)
+    return Panel.from_frame(df_clean, metrics)
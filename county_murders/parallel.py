@@ -0,0 +1,54 @@
+"""
+Process-pool helper shared by the parallel stages.
+
+The top-level scripts are plain scripts without an ``if __name__ ==
+'__main__'`` guard, so worker processes are started with ``fork``: the
+"spawn" start method would re-run the whole script in every worker.  On
+platforms without fork (Windows) the tasks run in the calling process.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def worker_count(n_jobs=None):
+    """Resolve ``n_jobs`` (None = all cores, -1 = all cores, -2 = all but one)."""
+    cpus = os.cpu_count() or 1
+    if n_jobs is None:
+        return cpus
+    if n_jobs < 0:
+        return max(1, cpus + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def _init_worker(initializer, initargs):
+    # One BLAS/OpenMP thread per process, otherwise N workers x N threads
+    # oversubscribe the machine.
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def map_tasks(func, tasks, n_jobs=None, initializer=None, initargs=()):
+    """``[func(t) for t in tasks]``, spread over a process pool.
+
+    Results are returned in task order, so callers that derive everything
+    from the task arguments get identical output for any ``n_jobs``.
+    """
+    tasks = list(tasks)
+    workers = min(worker_count(n_jobs), len(tasks))
+    if workers <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(t) for t in tasks]
+
+    ctx = multiprocessing.get_context('fork')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker,
+                             initargs=(initializer, initargs)) as pool:
+        return list(pool.map(func, tasks))
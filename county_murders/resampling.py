@@ -0,0 +1,224 @@
+"""
+Batched bootstrap and permutation tests for STEP 7.
+
+STEP 7 reports a parametric ``ttest_ind`` (pre vs post 1988) and a
+``pearsonr`` (unemployment vs murder rate).  Murder rates are heavy
+tailed and rows of the same county are not independent, so this module
+gives resampling versions of both tests, optionally resampling whole
+counties (``blocks``):
+
+    boot = bootstrap(rate, year < 1988, 'mean_diff', blocks=countyid)
+    boot['low'], boot['high']              # 95% CI of mean(pre) - mean(post)
+    permutation_test(unemp, rate, 'corr', blocks=countyid)['p_value']
+
+Both statistics are functions of a few sums per unit (a row, or a county
+with ``blocks``): counts and totals of each group for ``mean_diff``; n,
+sums, squares and cross-products for ``corr``.  A bootstrap replicate is
+a vector of resampling weights over the units, so a batch of replicates
+is one ``(replicates x units) @ (units x sums)`` product - no Python loop
+per replicate.  Permutation replicates are batched the same way:
+
+* ``mean_diff``: rows' group labels are shuffled; with blocks, each
+  county's pre and post rows swap labels with probability 1/2, which keeps
+  every county's rows together.
+* ``corr``: ``y`` is shuffled across rows; with blocks, whole county
+  series of ``y`` are exchanged between counties with the same number of
+  rows (rows of a county in their given order, e.g. by year).
+
+Replicates are drawn in fixed-size batches, each seeded from
+``(seed, batch number)``, and the batches can be spread over a process
+pool (parallel.map_tasks), so results depend on ``seed`` and
+``batch_size`` but not on ``n_jobs``.  p-values are two-sided,
+``(1 + #{|T*| >= |T|}) / (n_resamples + 1)``; intervals are bootstrap
+percentile intervals.
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import _bincount, _factorize
+from county_murders.parallel import map_tasks
+
+STATISTICS = ('mean_diff', 'corr')
+
+# Resampled index/weight matrices are kept below this many elements per batch
+BATCH_ELEMENTS = 1 << 22
+
+# Arrays shared with the workers (set once per process, not pickled per task)
+_DATA = None
+
+
+def _set_data(data):
+    global _DATA
+    _DATA = data
+
+
+def _row_sums(statistic, x, y):
+    """Per-row sufficient sums of ``statistic`` (rows x sums)."""
+    if statistic == 'mean_diff':
+        first = y.astype(bool)
+        return np.column_stack([first, np.where(first, x, 0.0), ~first, np.where(first, 0.0, x)]
+                               ).astype(np.float64)
+    if statistic == 'corr':
+        xc, yc = x - x.mean(), y - y.mean()
+        return np.column_stack([np.ones_like(xc), xc, yc, xc * xc, yc * yc, xc * yc])
+    raise ValueError(f"unknown statistic {statistic!r}; expected one of {STATISTICS}")
+
+
+def _evaluate(statistic, sums):
+    """Statistic from summed sufficient statistics (last axis)."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if statistic == 'mean_diff':
+            return sums[..., 1] / sums[..., 0] - sums[..., 3] / sums[..., 2]
+        n, sx, sy, sxx, syy, sxy = np.moveaxis(sums, -1, 0)
+        return (sxy - sx * sy / n) / np.sqrt((sxx - sx * sx / n) * (syy - sy * sy / n))
+
+
+def _prepare(statistic, x, y, blocks):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=bool if statistic == 'mean_diff' else np.float64)
+    if len(x) != len(y):
+        raise ValueError(f"x and y differ in length ({len(x)} vs {len(y)})")
+    sums = _row_sums(statistic, x, y)
+    data = {'statistic': statistic, 'x': x, 'y': y, 'rows': sums, 'units': sums}
+    if blocks is not None:
+        codes, _ = _factorize(pd.Series(np.asarray(blocks)))
+        data['codes'] = codes
+        data['units'] = _bincount(codes, sums, codes.max() + 1)
+    return data
+
+
+def _batches(n_resamples, units, batch_size, seed):
+    size = batch_size or max(1, min(n_resamples, BATCH_ELEMENTS // max(units, 1)))
+    return [(i, min(size, n_resamples - start), seed)
+            for i, start in enumerate(range(0, n_resamples, size))]
+
+
+def _rng(batch, seed):
+    return np.random.default_rng(np.random.SeedSequence([seed, batch]))
+
+
+def _bootstrap_batch(task):
+    batch, size, seed = task
+    units = _DATA['units']
+    n = len(units)
+    picks = _rng(batch, seed).integers(n, size=(size, n))
+    weights = np.bincount((picks + (np.arange(size) * n)[:, None]).ravel(),
+                          minlength=size * n).reshape(size, n)
+    return _evaluate(_DATA['statistic'], weights @ units)
+
+
+def _block_strata(codes):
+    """Row positions of the blocks, grouped by block size: ``[(blocks x size)]``."""
+    order = np.argsort(codes, kind='stable')
+    sizes = np.bincount(codes)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    strata = []
+    for size in np.unique(sizes[sizes > 0]):
+        blocks = np.flatnonzero(sizes == size)
+        if len(blocks) > 1:
+            strata.append(order[starts[blocks][:, None] + np.arange(size)])
+    return strata
+
+
+def _permutation_batch(task):
+    batch, size, seed = task
+    rng = _rng(batch, seed)
+    statistic, rows = _DATA['statistic'], _DATA['rows']
+    blocked = 'codes' in _DATA
+    if statistic == 'mean_diff':
+        if blocked:
+            # Swap the pre and post sums of each county with probability 1/2
+            units = _DATA['units']
+            swap = rng.random((size, len(units))) < 0.5
+            keep = ~swap
+            sums = np.stack([keep @ units[:, 0] + swap @ units[:, 2],
+                             keep @ units[:, 1] + swap @ units[:, 3],
+                             keep @ units[:, 2] + swap @ units[:, 0],
+                             keep @ units[:, 3] + swap @ units[:, 1]], axis=-1)
+        else:
+            labels = rng.permuted(np.broadcast_to(_DATA['y'], (size, len(rows))), axis=1)
+            first = labels @ _DATA['x']
+            n_first = rows[:, 0].sum()
+            sums = np.stack([np.full(size, n_first), first,
+                             np.full(size, len(rows) - n_first), _DATA['x'].sum() - first], axis=-1)
+        return _evaluate(statistic, sums)
+
+    # corr: only the cross-product changes when y is permuted
+    n = len(rows)
+    if blocked:
+        permutation = np.broadcast_to(np.arange(n), (size, n)).copy()
+        for positions in _DATA['strata']:
+            shuffled = rng.permuted(np.broadcast_to(np.arange(len(positions)),
+                                                    (size, len(positions))), axis=1)
+            permutation[:, positions.ravel()] = positions[shuffled].reshape(size, -1)
+    else:
+        permutation = rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis=1)
+    totals = rows.sum(axis=0)
+    sums = np.repeat(totals[None, :], size, axis=0)
+    sums[:, 5] = rows[:, 2][permutation] @ rows[:, 1]
+    return _evaluate(statistic, sums)
+
+
+def _replicates(func, data, tasks, n_jobs):
+    return np.concatenate(map_tasks(func, tasks, n_jobs, _set_data, (data,)))
+
+
+def bootstrap(x, y, statistic='mean_diff', blocks=None, n_resamples=2000, confidence=0.95,
+              seed=0, n_jobs=None, batch_size=None):
+    """Bootstrap distribution and percentile interval of a statistic.
+
+    Parameters
+    ----------
+    x : array-like
+        Values (``mean_diff``) or the first variable (``corr``).
+    y : array-like
+        Group membership, True for the first group (``mean_diff``), or the
+        second variable (``corr``).
+    statistic : {'mean_diff', 'corr'}
+        ``mean(x[y]) - mean(x[~y])`` or Pearson's r of x and y.
+    blocks : array-like, optional
+        Block (county) of every row; whole blocks are resampled.
+    n_resamples : int
+    confidence : float
+        Coverage of the percentile interval.
+    seed : int
+    n_jobs : int, optional
+        Worker processes (None = all cores).  Does not affect the results.
+    batch_size : int, optional
+        Replicates per batch (default: bounded by BATCH_ELEMENTS).
+
+    Returns
+    -------
+    dict with the observed ``statistic``, the interval ``low``/``high``,
+    the bootstrap standard error ``se`` and the ``replicates``.
+    """
+    data = _prepare(statistic, x, y, blocks)
+    observed = float(_evaluate(statistic, data['rows'].sum(axis=0)))
+    tasks = _batches(n_resamples, len(data['units']), batch_size, seed)
+    replicates = _replicates(_bootstrap_batch, data, tasks, n_jobs)
+    alpha = (1 - confidence) / 2
+    low, high = np.nanquantile(replicates, [alpha, 1 - alpha])
+    return {'statistic': observed, 'low': float(low), 'high': float(high),
+            'se': float(np.nanstd(replicates, ddof=1)), 'replicates': replicates}
+
+
+def permutation_test(x, y, statistic='mean_diff', blocks=None, n_resamples=2000, seed=0,
+                     n_jobs=None, batch_size=None):
+    """Two-sided permutation test of ``statistic`` (see bootstrap() for the arguments).
+
+    Returns
+    -------
+    dict with the observed ``statistic``, the empirical ``p_value`` and
+    the ``replicates`` under the null hypothesis.
+    """
+    data = _prepare(statistic, x, y, blocks)
+    if blocks is not None and statistic == 'corr':
+        data['strata'] = _block_strata(data['codes'])
+    observed = float(_evaluate(statistic, data['rows'].sum(axis=0)))
+    tasks = _batches(n_resamples, len(data['rows']), batch_size, seed)
+    replicates = _replicates(_permutation_batch, data, tasks, n_jobs)
+    # Small tolerance so replicates equal to the observed value up to rounding count
+    extreme = np.abs(replicates) >= np.abs(observed) * (1 - 1e-12)
+    p_value = (1 + extreme.sum()) / (len(replicates) + 1)
+    return {'statistic': observed, 'p_value': float(p_value), 'replicates': replicates}
@@ -0,0 +1,113 @@
+"""
+Column schema for the county_murders table.
+
+SQL_TYPES mirrors the CREATE TABLE block in county_murders_queries.sql
+(generated by script.py).  The loader uses it to pick compact dtypes at
+parse time instead of letting pandas infer int64/float64 everywhere:
+
+* DECIMAL columns are parsed straight to float32.
+* INT columns are downcast to the smallest integer type that holds their
+  observed range (int8/int16/int32).  Columns that contain missing values
+  become float32, or stay float64 if float32 cannot hold them exactly.
+
+Files derived from parsed tables (the data.py snapshots, the cube.py
+cube) carry fingerprint() in their names, so a change to this module or
+to the pandas version never serves tables with stale dtypes.
+"""
+
+import hashlib
+import inspect
+import sys
+
+import numpy as np
+import pandas as pd
+
+SQL_TYPES = {
+    'rownames': 'INT',
+    'arrests': 'INT',
+    'countyid': 'INT',
+    'density': 'DECIMAL(10,2)',
+    'popul': 'INT',
+    'perc1019': 'DECIMAL(5,2)',
+    'perc2029': 'DECIMAL(5,2)',
+    'percblack': 'DECIMAL(5,2)',
+    'percmale': 'DECIMAL(5,2)',
+    'rpcincmaint': 'DECIMAL(10,2)',
+    'rpcpersinc': 'DECIMAL(10,2)',
+    'rpcunemins': 'DECIMAL(10,2)',
+    'year': 'INT',
+    'murders': 'INT',
+    'murdrate': 'DECIMAL(10,6)',
+    'arrestrate': 'DECIMAL(10,6)',
+    'statefips': 'INT',
+    'countyfips': 'INT',
+    'execs': 'INT',
+    'lpopul': 'DECIMAL(10,5)',
+    'execrate': 'DECIMAL(10,6)',
+}
+
+COLUMNS = list(SQL_TYPES)
+INT_COLUMNS = [c for c, t in SQL_TYPES.items() if t == 'INT']
+DECIMAL_COLUMNS = [c for c, t in SQL_TYPES.items() if t.startswith('DECIMAL')]
+
+# Largest integer float32 represents exactly
+_FLOAT32_EXACT = 2 ** 24
+
+
+def parse_dtypes():
+    """dtype mapping handed to ``pd.read_csv``."""
+    return {c: 'float32' for c in DECIMAL_COLUMNS}
+
+
+def _compact_int(series):
+    if series.isna().any():
+        finite = series.dropna()
+        if finite.empty or finite.abs().max() < _FLOAT32_EXACT:
+            return series.astype('float32')
+        return series.astype('float64')
+    lo, hi = series.min(), series.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return series.astype(dtype)
+    return series.astype(np.int64)
+
+
+def compact(df):
+    """Downcast the INT columns of ``df`` in place and return it."""
+    for col in INT_COLUMNS:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = _compact_int(df[col])
+    return df
+
+
+def fingerprint():
+    """Short hash of this module's source and the pandas version."""
+    h = hashlib.sha256(inspect.getsource(sys.modules[__name__]).encode())
+    h.update(pd.__version__.encode())
+    return h.hexdigest()[:12]
+
+
+def read_csv(path, **read_csv_kwargs):
+    """Parse the CSV with the compact schema applied."""
+    dtype = parse_dtypes()
+    dtype.update(read_csv_kwargs.pop('dtype', None) or {})
+    return compact(pd.read_csv(path, dtype=dtype, **read_csv_kwargs))
+
+
+def memory_report(df):
+    """Memory of ``df`` vs. the same table with pandas' default 64-bit dtypes.
+
+    Returns a DataFrame with one row per column plus a TOTAL row.
+    """
+    after = df.memory_usage(index=False, deep=True)
+    before = pd.Series(
+        [len(df) * 8 if pd.api.types.is_numeric_dtype(df[c]) else after[c]
+         for c in df.columns],
+        index=df.columns,
+    )
+    report = pd.DataFrame({'dtype': df.dtypes.astype(str),
+                           'default_bytes': before, 'compact_bytes': after})
+    report.loc['TOTAL'] = ['', before.sum(), after.sum()]
+    report['ratio'] = report['default_bytes'] / report['compact_bytes']
+    return report
@@ -0,0 +1,154 @@
+"""
+Significance of every pairwise correlation, with multiple-testing control.
+
+STEP 7 tests a single pair (``pearsonr`` of rpcunemins and murdrate)
+while STEP 4 and figure 3 look at 9-10 variables, i.e. 36-45 pairs, and
+more once the table is split by year or state.  correlation_tests() takes
+the pairwise co-moments of all columns (online.CoMoments, one pass of
+matrix products per group) and turns them into r, t and p for every pair
+at once:
+
+    t = r * sqrt((n - 2) / (1 - r**2)),   p = 2 * P(T_{n-2} > |t|)
+
+which is exactly ``scipy.stats.pearsonr``, with ``n`` the pairwise-
+complete row count.  Benjamini-Hochberg q-values control the false
+discovery rate over all tested pairs (``family='all'``, across groups) or
+within each group (``family='group'``):
+
+    tests = correlation_tests(df_clean, KEY_VARS)
+    tests[tests['q_value'] < 0.05]
+    square(tests, 'p_value')                 # back to a variables x variables matrix
+    correlation_tests(df_clean, KEY_VARS, by='year')
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import _factorize
+from county_murders.lazy import lazy_import
+from county_murders.online import CoMoments
+
+stats = lazy_import('scipy.stats')
+
+FAMILIES = ('all', 'group')
+
+
+def bh_adjust(p_values):
+    """Benjamini-Hochberg adjusted p-values (q-values); NaNs are left out."""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    q_values = np.full(p_values.shape, np.nan)
+    tested = np.flatnonzero(~np.isnan(p_values))
+    if not len(tested):
+        return q_values
+    order = tested[np.argsort(p_values[tested], kind='stable')]
+    m = len(order)
+    scaled = p_values[order] * m / np.arange(1, m + 1)
+    # Enforce monotonicity from the largest p-value down
+    q_values[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return q_values
+
+
+def _t_tests(n, r):
+    """t statistics and two-sided p-values of correlations ``r`` over ``n`` rows."""
+    dof = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_stat = np.where(dof > 0, r * np.sqrt(dof / (1 - r * r)), np.nan)
+    p_value = np.where(dof > 0, 2 * stats.t.sf(np.abs(t_stat), np.maximum(dof, 1)), np.nan)
+    return t_stat, p_value
+
+
+def _table(index, n, r):
+    t_stat, p_value = _t_tests(n, r)
+    return pd.DataFrame({'n': n.astype(np.int64), 'r': r, 't_stat': t_stat, 'p_value': p_value},
+                        index=index)
+
+
+def pair_tests(moments, columns=None):
+    """r, t and p-value of every pair of columns of a CoMoments.
+
+    Returns
+    -------
+    DataFrame indexed by (var1, var2) over the pairs above the diagonal,
+    with n, r, t_stat and p_value.
+    """
+    columns = moments.columns if columns is None else list(columns)
+    positions = [moments.columns.index(column) for column in columns]
+    r = moments.corr_values()[np.ix_(positions, positions)]
+    n = moments.n[np.ix_(positions, positions)]
+    upper = np.triu_indices(len(columns), k=1)
+    names = np.asarray(columns)
+    index = pd.MultiIndex.from_arrays([names[upper[0]], names[upper[1]]], names=['var1', 'var2'])
+    return _table(index, n[upper], r[upper])
+
+
+def correlation_tests(df, columns, by=None, family='all'):
+    """Pairwise correlation tests of ``columns``, optionally per group.
+
+    Parameters
+    ----------
+    df : DataFrame
+    columns : list of str
+        Variables to correlate (missing values are handled pairwise).
+    by : str, optional
+        Grouping column (e.g. ``'year'`` or ``'statefips'``); the result
+        then has the group as its first index level.
+    family : {'all', 'group'}
+        Pairs over which the Benjamini-Hochberg q-values are computed.
+
+    Returns
+    -------
+    DataFrame indexed by ([group,] var1, var2) with n, r, t_stat, p_value
+    and q_value.
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"unknown family {family!r}; expected one of {FAMILIES}")
+    columns = list(columns)
+    if by is None:
+        tests = pair_tests(CoMoments(columns).update(df))
+        tests['q_value'] = bh_adjust(tests['p_value'])
+        return tests
+
+    # Rows sorted by group; each group's co-moments come from its slice of
+    # one float64 array, and the t/p step runs once over all groups
+    codes, groups = _factorize(df[by])
+    keep = codes >= 0
+    order = np.argsort(codes[keep], kind='stable')
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)[keep][order]
+    bounds = np.cumsum(np.bincount(codes[keep], minlength=len(groups)))
+    upper = np.triu_indices(len(columns), k=1)
+    n, r = [], []
+    start = 0
+    for end in bounds:
+        moments = CoMoments(columns).update_values(values[start:end])
+        n.append(moments.n[upper])
+        r.append(moments.corr_values()[upper])
+        start = end
+    names = np.asarray(columns)
+    pairs = len(upper[0])
+    index = pd.MultiIndex.from_arrays([np.repeat(groups, pairs), np.tile(names[upper[0]], len(groups)),
+                                       np.tile(names[upper[1]], len(groups))],
+                                      names=[by, 'var1', 'var2'])
+    tests = _table(index, np.concatenate(n), np.concatenate(r))
+    if family == 'all':
+        tests['q_value'] = bh_adjust(tests['p_value'])
+    else:
+        tests['q_value'] = np.concatenate([bh_adjust(block) for block in
+                                           tests['p_value'].to_numpy().reshape(-1, pairs)])
+    return tests
+
+
+def square(tests, value='r'):
+    """One column of a pair_tests()/correlation_tests() table as a symmetric matrix.
+
+    For grouped tests select a group first, e.g. ``square(tests.loc[1988])``.
+    The diagonal is 1 for ``r`` and NaN otherwise.
+    """
+    first = tests.index.get_level_values('var1')
+    second = tests.index.get_level_values('var2')
+    names = pd.Index(list(dict.fromkeys(list(first) + list(second))))
+    i, j = names.get_indexer(first), names.get_indexer(second)
+    matrix = np.full((len(names), len(names)), np.nan)
+    matrix[i, j] = matrix[j, i] = tests[value].to_numpy()
+    if value == 'r':
+        np.fill_diagonal(matrix, 1.0)
+    return pd.DataFrame(matrix, index=names, columns=names)
@@ -0,0 +1,334 @@
+"""
+Mergeable quantile and distinct-count sketches.
+
+Query 18 (per-year quartiles), Query 15 (NTILE(20)), Query 4 (COUNT
+(DISTINCT countyid) per state) and box plot 5 (quartiles per state) all
+sort or materialize every row of a group.  The sketches here answer the
+same questions from one streaming pass in memory that does not grow with
+the rows, and two sketches of the same kind can be merged, so partitions
+processed separately (chunks, processes, files) combine into the sketch of
+the whole:
+
+    quartiles = group_sketches(iter_chunks(columns=['year', 'murdrate']),
+                               'year', 'murdrate')
+    quartiles.quantiles([0.25, 0.5, 0.75])      # Query 18
+    counties = group_sketches([df_clean], 'statefips', 'countyid',
+                              kind='distinct')
+    counties.distinct()                         # Query 4
+
+QuantileSketch is a KLL sketch (Karnin, Lang and Liberty, 2016): items
+live in levels of weight 1, 2, 4, ...; a full level is sorted and every
+other item (from a random offset) is promoted to the next level.  Each
+such compaction of a level of weight ``w`` moves the rank of any value by
+0 or +-w with mean zero, so the sketch records the sum of ``w**2`` over
+its compactions and rank_error() turns it into a Hoeffding bound: with
+probability ``confidence`` the rank of a returned quantile is within
+``rank_error() * n`` of the exact one.  With the default ``k=200`` this
+is typically 1-2% of n.  Until the first compaction (n <= k) the sketch
+is exact and interpolates like ``PERCENTILE_CONT``.
+
+DistinctCounter is a HyperLogLog counter with ``2**p`` registers (4 KiB
+for the default ``p=12``) over 64-bit value hashes.  Its relative standard
+error is ``1.04 / sqrt(2**p)`` (1.6%); small counts (up to ``2.5 *
+2**p``, e.g. the counties of a state) use linear counting, whose error is
+smaller still (about 1% at 300 distinct values, exact for most states).
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import _factorize
+
+KINDS = ('quantile', 'distinct')
+
+
+class QuantileSketch:
+    """KLL quantile sketch of a stream of numbers.
+
+    Parameters
+    ----------
+    k : int
+        Capacity of the top level; the sketch keeps roughly ``3 * k``
+        items and its rank error shrinks like ``1 / k``.
+    seed : int, optional
+        Seed of the compaction offsets, for reproducible results.
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._sq_weights = 0.0
+        self._rng = np.random.default_rng(seed)
+
+    def __repr__(self):
+        return f"QuantileSketch(k={self.k}, n={self.n}, items={self.size})"
+
+    @property
+    def size(self):
+        """Number of items retained."""
+        return sum(len(level) for level in self.levels)
+
+    def _capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """Add an array of values; NaNs are skipped."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold another sketch with the same ``k`` into this one."""
+        if other.k != self.k:
+            raise ValueError(f"cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._sq_weights += other._sq_weights
+        self._compress()
+        return self
+
+    def _compress(self):
+        while self.size > sum(self._capacity(h) for h in range(len(self.levels))):
+            h = next(h for h, level in enumerate(self.levels) if len(level) >= self._capacity(h))
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            level = np.sort(self.levels[h])
+            # An odd item out stays behind at this level
+            keep, level = level[:len(level) % 2], level[len(level) % 2:]
+            offset = self._rng.integers(2)
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], level[offset::2]])
+            self.levels[h] = keep
+            self._sq_weights += 4.0 ** h
+
+    def _weighted(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 2.0 ** h)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], np.cumsum(weights[order])
+
+    def quantile(self, q):
+        """Approximate ``q``-quantile(s); ``q`` is a float or an array in [0, 1]."""
+        q = np.asarray(q, dtype=np.float64)
+        if not self.n:
+            return np.full(q.shape, np.nan) if q.ndim else np.nan
+        if len(self.levels) == 1:
+            result = np.quantile(self.levels[0], q)
+        else:
+            items, cumulative = self._weighted()
+            index = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+            result = items[np.minimum(index, len(items) - 1)]
+            result = np.where(q <= 0, self.min, np.where(q >= 1, self.max, result))
+        return float(result) if not q.ndim else result
+
+    def rank(self, value):
+        """Approximate fraction of the values that are <= ``value``."""
+        if not self.n:
+            return np.nan
+        items, cumulative = self._weighted()
+        index = np.searchsorted(items, value, side='right')
+        return float(cumulative[index - 1] / cumulative[-1]) if index else 0.0
+
+    def rank_error(self, confidence=0.99):
+        """Bound on the normalized rank error of one query at ``confidence``.
+
+        Hoeffding's inequality over the compactions so far:
+        ``sqrt(2 * sum(w**2) * ln(2 / (1 - confidence))) / n``; 0 while the
+        sketch is exact.
+        """
+        if not self.n:
+            return np.nan
+        return math.sqrt(2 * self._sq_weights * math.log(2 / (1 - confidence))) / self.n
+
+
+def _bit_length(x):
+    """Bit length of every element of a uint64 array."""
+    bits = np.zeros(len(x), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= np.uint64(1 << shift)
+        x = np.where(high, x >> np.uint64(shift), x)
+        bits += high * shift
+    return bits + (x > 0)
+
+
+def _hash(values):
+    """64-bit hashes of an array; integers hash equally whatever their width."""
+    values = np.asarray(values)
+    if values.dtype.kind in 'iub':
+        values = values.astype(np.int64)
+    elif values.dtype.kind == 'f':
+        values = values.astype(np.float64)
+        values = values[~np.isnan(values)]
+    return pd.util.hash_array(values)
+
+
+class DistinctCounter:
+    """HyperLogLog estimate of the number of distinct values in a stream.
+
+    Parameters
+    ----------
+    p : int
+        ``2**p`` one-byte registers; the relative standard error is
+        ``1.04 / sqrt(2**p)``.
+    """
+
+    def __init__(self, p=12):
+        if not 4 <= p <= 18:
+            raise ValueError(f"p must be between 4 and 18, got {p}")
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def __repr__(self):
+        return f"DistinctCounter(p={self.p}, estimate={self.estimate():.0f})"
+
+    @property
+    def standard_error(self):
+        """Relative standard error of estimate() for large counts."""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def update(self, values):
+        """Add an array of values (NaNs are skipped)."""
+        hashes = _hash(values)
+        if not len(hashes):
+            return self
+        width = 64 - self.p
+        index = (hashes >> np.uint64(width)).astype(np.intp)
+        rest = hashes & np.uint64((1 << width) - 1)
+        # Position of the leftmost 1-bit in the remaining ``width`` bits
+        rho = (width - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rho)
+        return self
+
+    def merge(self, other):
+        """Fold another counter with the same ``p`` into this one."""
+        if other.p != self.p:
+            raise ValueError(f"cannot merge counters with p={self.p} and p={other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Estimated number of distinct values."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        empty = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and empty:
+            return m * math.log(m / empty)
+        return float(raw)
+
+
+class GroupedSketches:
+    """One sketch per key value, filled from ``(keys, values)`` batches.
+
+    ``factory`` builds an empty sketch (e.g. ``QuantileSketch`` or
+    ``lambda: DistinctCounter(p=10)``).
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.sketches = {}
+
+    def __repr__(self):
+        return f"GroupedSketches(groups={len(self.sketches)})"
+
+    def __getitem__(self, key):
+        return self.sketches[key]
+
+    def __contains__(self, key):
+        return key in self.sketches
+
+    def __len__(self):
+        return len(self.sketches)
+
+    def update(self, keys, values):
+        """Route each value to the sketch of its key (NaN keys are dropped)."""
+        codes, uniques = _factorize(pd.Series(keys))
+        values = np.asarray(values)
+        keep = codes >= 0
+        codes, values = codes[keep], values[keep]
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+        for key, group in zip(uniques.tolist(), np.split(values[order], bounds)):
+            if len(group):
+                if key not in self.sketches:
+                    self.sketches[key] = self.factory()
+                self.sketches[key].update(group)
+        return self
+
+    def merge(self, other):
+        """Merge the sketches of another GroupedSketches key by key."""
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+        return self
+
+    def _index(self):
+        return sorted(self.sketches)
+
+    def quantiles(self, q=(0.25, 0.5, 0.75)):
+        """Quantiles per key (rows) and ``q`` (columns), with count and rank error."""
+        keys = self._index()
+        table = pd.DataFrame([self.sketches[key].quantile(np.asarray(q)) for key in keys],
+                             index=keys, columns=list(q))
+        table.insert(0, 'count', [self.sketches[key].n for key in keys])
+        table['rank_error'] = [self.sketches[key].rank_error() for key in keys]
+        return table
+
+    def distinct(self):
+        """Estimated distinct values per key."""
+        keys = self._index()
+        return pd.Series([self.sketches[key].estimate() for key in keys], index=keys,
+                         name='distinct')
+
+
+def group_sketches(chunks, by, column, kind='quantile', **options):
+    """Sketch ``column`` per value of ``by`` over an iterable of DataFrames.
+
+    Parameters
+    ----------
+    chunks : iterable of DataFrame
+        E.g. ``data.iter_chunks(columns=[by, column])`` or ``[df_clean]``.
+    by : str
+        Grouping column.
+    column : str
+        Column to sketch.
+    kind : {'quantile', 'distinct'}
+        QuantileSketch or DistinctCounter per group.
+    **options
+        Passed to the sketch (``k``/``seed`` or ``p``).
+
+    Returns
+    -------
+    GroupedSketches
+    """
+    if kind == 'quantile':
+        options.setdefault('seed', 0)
+        sketch = QuantileSketch
+    elif kind == 'distinct':
+        sketch = DistinctCounter
+    else:
+        raise ValueError(f"unknown sketch kind {kind!r}; expected one of {KINDS}")
+    groups = GroupedSketches(lambda: sketch(**options))
+    for chunk in chunks:
+        groups.update(chunk[by].to_numpy(), chunk[column].to_numpy())
+    return groups
@@ -0,0 +1,183 @@
+"""
+In-process runner for the numbered queries in county_murders_queries.sql.
+
+The .sql file is written for a MySQL server.  Here the cleaned table is
+registered in an embedded engine (DuckDB when installed, otherwise the
+standard library's sqlite3) and each "-- Query N:" block is translated
+and executed:
+
+* CREATE DATABASE / USE / CREATE TABLE / LOAD DATA setup is skipped; the
+  DataFrame is registered as ``county_murders`` instead.
+* ``STDDEV`` (population standard deviation in MySQL) -> ``STDDEV_POP``.
+* ``INTO OUTFILE ...`` is removed; the rows are returned and, if an
+  export directory is given, written there as CSV.
+* SQLite only: ``PERCENTILE_CONT(p) WITHIN GROUP (ORDER BY x)`` becomes a
+  registered ``percentile_cont(x, p)`` aggregate, ``CREATE OR REPLACE
+  VIEW`` becomes DROP + CREATE, and ``/`` is forced to real division.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+SQL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'county_murders_queries.sql')
+
+TABLE = 'county_murders'
+
+_QUERY_HEADER = re.compile(r'^--\s*Query\s+(\d+):\s*(.*)$', re.MULTILINE)
+_OUTFILE = re.compile(r"\s+INTO\s+OUTFILE\s+'([^']*)'.*?(?=;|$)", re.IGNORECASE | re.DOTALL)
+_PERCENTILE = re.compile(
+    r'PERCENTILE_CONT\(\s*([\d.]+)\s*\)\s*WITHIN\s+GROUP\s*\(\s*ORDER\s+BY\s+(\w+)\s*\)',
+    re.IGNORECASE)
+
+
+def load_queries(path=SQL_PATH):
+    """Parse the .sql file into ``{number: (title, sql)}``."""
+    with open(path) as f:
+        text = re.sub(r'/\*.*?\*/', '', f.read(), flags=re.DOTALL)
+    headers = list(_QUERY_HEADER.finditer(text))
+    queries = {}
+    for i, match in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+        body = '\n'.join(line for line in text[match.end():end].splitlines()
+                         if not line.strip().startswith('--'))
+        queries[int(match.group(1))] = (match.group(2).strip(), body.strip())
+    return queries
+
+
+def translate(sql, engine):
+    """Translate one query block to ``engine``.
+
+    Returns ``(statements, outfile)`` where ``outfile`` is the path of a
+    removed INTO OUTFILE clause, or None.
+    """
+    outfile = None
+    match = _OUTFILE.search(sql)
+    if match:
+        outfile = match.group(1)
+        sql = sql[:match.start()] + sql[match.end():]
+    sql = re.sub(r'\bSTDDEV\s*\(', 'STDDEV_POP(', sql, flags=re.IGNORECASE)
+
+    if engine == 'sqlite':
+        sql = _PERCENTILE.sub(r'percentile_cont(\2, \1)', sql)
+        sql = re.sub(r'CREATE\s+OR\s+REPLACE\s+VIEW\s+(\w+)',
+                     r'DROP VIEW IF EXISTS \1; CREATE VIEW \1', sql, flags=re.IGNORECASE)
+        # MySQL's / always returns a fractional result
+        sql = re.sub(r'/(\s*)(?=[\w(])', r'* 1.0 /\1', sql)
+
+    statements = [s.strip() for s in sql.split(';') if s.strip()]
+    return statements, outfile
+
+
+class _StddevPop:
+    def __init__(self):
+        self.n, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def step(self, value):
+        if value is None:
+            return
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def finalize(self):
+        return math.sqrt(self.m2 / self.n) if self.n else None
+
+
+class _PercentileCont:
+    def __init__(self):
+        self.values, self.p = [], None
+
+    def step(self, value, p):
+        self.p = p
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return float(np.percentile(self.values, self.p * 100)) if self.values else None
+
+
+def connect(df, engine=None):
+    """Register ``df`` as the county_murders table; returns ``(con, engine)``."""
+    if engine in (None, 'duckdb'):
+        try:
+            import duckdb
+        except ImportError:
+            if engine == 'duckdb':
+                raise
+        else:
+            con = duckdb.connect()
+            con.register('_df', df)
+            con.execute(f'CREATE TABLE {TABLE} AS SELECT * FROM _df')
+            con.unregister('_df')
+            return con, 'duckdb'
+
+    con = sqlite3.connect(':memory:')
+    con.create_aggregate('stddev_pop', 1, _StddevPop)
+    con.create_aggregate('percentile_cont', 2, _PercentileCont)
+    df.to_sql(TABLE, con, index=False)
+    return con, 'sqlite'
+
+
+def _execute(con, engine, statement):
+    if engine == 'duckdb':
+        result = con.execute(statement)
+        return result.df() if result.description else None
+    cursor = con.execute(statement)
+    if cursor.description is None:
+        return None
+    return pd.DataFrame(cursor.fetchall(), columns=[c[0] for c in cursor.description])
+
+
+def run_queries(df, path=SQL_PATH, engine=None, numbers=None, export_dir=None):
+    """Run the numbered queries against ``df``.
+
+    Parameters
+    ----------
+    df : DataFrame
+        Table to query (normally ``df_clean``).
+    engine : {'duckdb', 'sqlite'}, optional
+        Defaults to DuckDB if installed.
+    numbers : iterable of int, optional
+        Only run these query numbers.
+    export_dir : str, optional
+        Where INTO OUTFILE results are written (by file name).
+
+    Returns
+    -------
+    (results, timings): ``results`` maps query number to the DataFrame of
+    its last statement; ``timings`` has one row per query with title,
+    seconds and rows.
+    """
+    queries = load_queries(path)
+    con, engine = connect(df, engine)
+    results, rows = {}, []
+    try:
+        for number in sorted(numbers or queries):
+            title, sql = queries[number]
+            statements, outfile = translate(sql, engine)
+            start = time.perf_counter()
+            result = None
+            for statement in statements:
+                out = _execute(con, engine, statement)
+                if out is not None:
+                    result = out
+            seconds = time.perf_counter() - start
+            if outfile and export_dir and result is not None:
+                os.makedirs(export_dir, exist_ok=True)
+                result.to_csv(os.path.join(export_dir, os.path.basename(outfile)), index=False)
+            results[number] = result
+            rows.append({'query': number, 'title': title, 'seconds': seconds,
+                         'rows': 0 if result is None else len(result)})
+    finally:
+        con.close()
+    timings = pd.DataFrame(rows).set_index('query')
+    timings.attrs['engine'] = engine
+    return results, timings
@@ -0,0 +1,187 @@
+"""
+Synthetic county-year panels with the 21-column county_murders schema.
+
+The real extract is only a few thousand rows, which says little about how
+the pipeline scales.  generate_panel() produces statistically similar
+panels of any size: every county gets persistent traits (population,
+land area, demographics, income) that drift over the years, murders are
+Poisson counts whose rate depends on those traits plus a national year
+effect, and a small share of arrest figures is left missing so the
+dropna() step has work to do.
+
+Defaults roughly follow the real data; params_from_frame() re-estimates
+them from a loaded table.
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.schema import COLUMNS
+
+DEFAULT_PARAMS = {
+    'first_year': 1980,
+    'n_years': 17,
+    'log_pop_mean': 10.3,       # county population ~ lognormal
+    'log_pop_sd': 1.3,
+    'pop_growth_sd': 0.01,      # yearly log growth per county
+    'log_area_mean': 6.5,       # land area (sq. miles) ~ lognormal
+    'log_area_sd': 0.8,
+    'percblack_mean': 9.0,      # county share, beta distributed
+    'base_murder_rate': 0.6,    # murders per 10,000 people
+    'arrest_ratio': 0.8,        # arrests per murder
+    'persinc_median': 12000.0,  # real per-capita personal income
+    'unemins_median': 60.0,     # real per-capita unemployment insurance
+    'incmaint_median': 80.0,    # real per-capita income maintenance
+    'exec_rate': 0.002,         # executions per county-year
+    'missing_rate': 0.02,       # share of rows with missing arrest data
+}
+
+# State FIPS codes of the 50 states + DC
+STATE_FIPS = np.array([1, 2, 4, 5, 6, 8, 9, 10, 11, 12, 13, 15, 16, 17, 18, 19, 20, 21, 22,
+                       23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39,
+                       40, 41, 42, 44, 45, 46, 47, 48, 49, 50, 51, 53, 54, 55, 56])
+
+
+def params_from_frame(df):
+    """Estimate generator parameters from a real county-year table."""
+    df = df.dropna()
+    per_county = df.groupby('countyid')
+    log_pop = np.log(per_county['popul'].mean().clip(lower=1))
+    return dict(
+        DEFAULT_PARAMS,
+        first_year=int(df['year'].min()),
+        n_years=int(df['year'].max() - df['year'].min() + 1),
+        log_pop_mean=float(log_pop.mean()),
+        log_pop_sd=float(log_pop.std()) if len(log_pop) > 1 else DEFAULT_PARAMS['log_pop_sd'],
+        percblack_mean=float(df['percblack'].mean()),
+        base_murder_rate=float(df['murders'].sum() / df['popul'].sum() * 1e4),
+        arrest_ratio=float(df['arrests'].sum() / max(df['murders'].sum(), 1)),
+        persinc_median=float(df['rpcpersinc'].median()),
+        unemins_median=float(df['rpcunemins'].median()),
+        incmaint_median=float(df['rpcincmaint'].median()),
+    )
+
+
+def _county_block(first_county, n_counties, p, rng, id_scale=1000):
+    """All years for ``n_counties`` consecutive synthetic counties.
+
+    countyid is ``statefips * id_scale + countyfips`` (id_scale is 1000
+    as in the real data unless there are too many counties per state).
+    """
+    years = p['first_year'] + np.arange(p['n_years'])
+    n_years = len(years)
+    n = n_counties * n_years
+
+    def per_county(values):
+        return np.repeat(values, n_years)
+
+    t = np.tile(np.arange(n_years), n_counties)
+    county_no = first_county + np.arange(n_counties)
+    statefips = STATE_FIPS[county_no % len(STATE_FIPS)]
+    countyfips = 1 + 2 * (county_no // len(STATE_FIPS))
+
+    log_pop0 = rng.normal(p['log_pop_mean'], p['log_pop_sd'], n_counties)
+    growth = rng.normal(0.005, p['pop_growth_sd'], n_counties)
+    popul = np.maximum(np.exp(per_county(log_pop0) + per_county(growth) * t), 100).astype(np.int64)
+    area = per_county(np.exp(rng.normal(p['log_area_mean'], p['log_area_sd'], n_counties)))
+    density = popul / area
+
+    # Beta(a, b) with the requested mean and a long right tail
+    mean_black = min(max(p['percblack_mean'] / 100, 1e-3), 0.9)
+    a = 0.6
+    percblack = per_county(rng.beta(a, a * (1 - mean_black) / mean_black, n_counties)) * 100
+    percblack = np.clip(percblack + rng.normal(0, 0.3, n), 0, 100)
+    percmale = per_county(rng.normal(49.0, 1.2, n_counties)) + rng.normal(0, 0.2, n)
+    perc1019 = per_county(rng.normal(14.5, 1.5, n_counties)) - 0.05 * t + rng.normal(0, 0.3, n)
+    perc2029 = per_county(rng.normal(15.5, 2.5, n_counties)) - 0.08 * t + rng.normal(0, 0.3, n)
+
+    cycle = 1 + 0.25 * np.sin(2 * np.pi * t / 9)
+    rpcpersinc = per_county(p['persinc_median'] * np.exp(rng.normal(0, 0.2, n_counties))) \
+        * (1.015 ** t) * np.exp(rng.normal(0, 0.02, n))
+    rpcunemins = per_county(p['unemins_median'] * np.exp(rng.normal(0, 0.5, n_counties))) \
+        * cycle * np.exp(rng.normal(0, 0.1, n))
+    rpcincmaint = per_county(p['incmaint_median'] * np.exp(rng.normal(0, 0.5, n_counties))) \
+        * np.exp(rng.normal(0, 0.1, n))
+
+    # Murder rate per 10,000: county effect, demographics, density and a
+    # national rise to the early 1990s followed by a decline
+    year_effect = 0.25 * np.sin(np.pi * t / (n_years + 2))
+    log_rate = (np.log(p['base_murder_rate']) + per_county(rng.normal(0, 0.4, n_counties))
+                + 0.025 * (percblack - p['percblack_mean'])
+                + 0.1 * (np.log1p(density) - 4) + year_effect
+                + 0.1 * np.log(rpcunemins / p['unemins_median']))
+    murders = rng.poisson(np.exp(log_rate) * popul / 1e4)
+    arrests = rng.poisson(murders * p['arrest_ratio'])
+    execs = rng.poisson(p['exec_rate'], n)
+
+    frame = pd.DataFrame({
+        'rownames': 0,
+        'arrests': arrests.astype(np.float64),
+        'countyid': per_county(statefips * id_scale + countyfips),
+        'density': density.round(2),
+        'popul': popul,
+        'perc1019': perc1019.round(2),
+        'perc2029': perc2029.round(2),
+        'percblack': percblack.round(2),
+        'percmale': percmale.round(2),
+        'rpcincmaint': rpcincmaint.round(2),
+        'rpcpersinc': rpcpersinc.round(2),
+        'rpcunemins': rpcunemins.round(2),
+        'year': np.tile(years, n_counties),
+        'murders': murders,
+        'murdrate': (murders / popul * 1e4).round(6),
+        'arrestrate': (arrests / popul * 1e4).round(6),
+        'statefips': per_county(statefips),
+        'countyfips': per_county(countyfips),
+        'execs': execs,
+        'lpopul': np.log(popul).round(5),
+        'execrate': (execs / popul * 1e4).round(6),
+    }, columns=COLUMNS)
+    missing = rng.random(n) < p['missing_rate']
+    frame.loc[missing, ['arrests', 'arrestrate']] = np.nan
+    return frame
+
+
+# Counties generated per random stream; fixed so that the data does not
+# depend on the chunk size
+_BLOCK_COUNTIES = 2048
+
+
+def iter_panel(n_rows, chunk_rows=1_000_000, seed=0, params=None):
+    """Yield a synthetic panel of ``n_rows`` rows in chunks.
+
+    Chunks cover whole counties (all years), so memory stays bounded by
+    ``chunk_rows`` however large the panel is.  The output depends only
+    on ``n_rows``, ``seed`` and ``params``, not on ``chunk_rows``.
+    """
+    p = dict(DEFAULT_PARAMS, **(params or {}))
+    n_years = p['n_years']
+    n_counties = -(-n_rows // n_years)
+    n_blocks = -(-n_counties // _BLOCK_COUNTIES)
+    blocks_per_chunk = max(1, chunk_rows // (n_years * _BLOCK_COUNTIES))
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    max_countyfips = 1 + 2 * ((n_counties - 1) // len(STATE_FIPS))
+    id_scale = 10 ** max(3, len(str(max_countyfips)))
+    emitted = 0
+    for first_block in range(0, n_blocks, blocks_per_chunk):
+        blocks = []
+        for b in range(first_block, min(first_block + blocks_per_chunk, n_blocks)):
+            first = b * _BLOCK_COUNTIES
+            count = min(_BLOCK_COUNTIES, n_counties - first)
+            blocks.append(_county_block(first, count, p, np.random.default_rng(seeds[b]), id_scale))
+        chunk = pd.concat(blocks, ignore_index=True).iloc[:n_rows - emitted]
+        chunk['rownames'] = emitted + 1 + np.arange(len(chunk))
+        emitted += len(chunk)
+        yield chunk
+
+
+def generate_panel(n_rows, seed=0, params=None):
+    """Synthetic panel of ``n_rows`` rows as one DataFrame."""
+    return pd.concat(iter_panel(n_rows, seed=seed, params=params), ignore_index=True)
+
+
+def write_panel_csv(path, n_rows, seed=0, params=None, chunk_rows=1_000_000):
+    """Stream a synthetic panel to ``path`` without holding it in memory."""
+    for i, chunk in enumerate(iter_panel(n_rows, chunk_rows, seed, params)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
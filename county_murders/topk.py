@@ -0,0 +1,202 @@
+"""
+Exact top-k rankings from a stream of chunks.
+
+Plot 6 and Query 7 rank counties by their total murders, and Query 9
+lists the 20 county-years with the highest murder rate; both group and
+sort the whole table.  The two accumulators here give the same answers
+from chunks (data.iter_chunks()) or from partitions processed separately:
+
+    totals = top_groups(iter_chunks(columns=['countyid', 'murders']),
+                        'countyid', 'murders')
+    totals.top(10)                          # plot 6 / Query 7
+    totals.top(5, stat='mean')
+    by_year = top_groups(chunks, 'countyid', 'murders', by='year')
+    by_year.top(3)                          # top 3 counties in every year
+    top_rows(chunks, 'murdrate', k=20)      # Query 9's ORDER BY ... LIMIT 20
+
+GroupTotals keeps one running count and sum per group - a group's total
+is not final until the last chunk, so an exact ranking of totals needs
+every partial sum, but only one row per group, never the rows.  Partial
+sums of two accumulators add, so partitions merge.  top() then selects the
+``k`` largest per partition with ``nlargest`` (a partial selection, not a
+full sort of the groups).
+
+TopRows ranks rows rather than groups, so it only ever holds ``k``
+candidates (per partition): each chunk's best ``k`` rows are merged into
+the candidates and the rest are dropped.
+
+Ties keep the first entry in key order (GroupTotals) or arrival order
+(TopRows), like ``nlargest(keep='first')``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from county_murders.aggregate import _factorize
+
+STATS = ('sum', 'count', 'mean')
+
+
+def _partials(chunk, keys, metric):
+    """Count and sum of ``metric`` per combination of ``keys`` in one chunk."""
+    codes, levels = zip(*(_factorize(chunk[key]) for key in keys))
+    values = chunk[metric].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = ~np.isnan(values)
+    for key_codes in codes:
+        valid &= key_codes >= 0
+    shape = [len(uniques) for uniques in levels]
+    flat = np.ravel_multi_index([key_codes[valid] for key_codes in codes], shape)
+    cell_codes, cells = _factorize(pd.Series(flat))
+    count = np.bincount(cell_codes, minlength=len(cells))
+    total = np.bincount(cell_codes, weights=values[valid], minlength=len(cells))
+    positions = np.unravel_index(cells, shape)
+    index = pd.MultiIndex.from_arrays([levels[i][positions[i]] for i in range(len(keys))],
+                                      names=keys)
+    return pd.DataFrame({'count': count, 'sum': total}, index=index)
+
+
+class GroupTotals:
+    """Running count and sum of ``metric`` per ``key`` (per ``by`` partition).
+
+    Parameters
+    ----------
+    key : str
+        Entity to rank, e.g. ``'countyid'``.
+    metric : str
+        Column to total, e.g. ``'murders'``.
+    by : str, optional
+        Partition to rank within, e.g. ``'year'`` or ``'statefips'``.
+    """
+
+    def __init__(self, key='countyid', metric='murders', by=None):
+        self.key = key
+        self.metric = metric
+        self.by = by
+        self.partials = None
+        # Whether every chunk added so far had an integer metric (None: no chunk yet)
+        self.integer = None
+
+    def __repr__(self):
+        groups = 0 if self.partials is None else len(self.partials)
+        return f"GroupTotals(key={self.key!r}, metric={self.metric!r}, by={self.by!r}, groups={groups})"
+
+    @property
+    def keys(self):
+        return [self.by, self.key] if self.by else [self.key]
+
+    def update(self, chunk):
+        """Add one DataFrame chunk to the partial sums."""
+        if not len(chunk):
+            return self
+        self._set_integer(chunk[self.metric].dtype.kind in 'iub')
+        return self._add(_partials(chunk, self.keys, self.metric))
+
+    def merge(self, other):
+        """Add the partial sums of another accumulator (same key, metric, by)."""
+        if (other.key, other.metric, other.by) != (self.key, self.metric, self.by):
+            raise ValueError("cannot merge GroupTotals of different keys or metrics")
+        if other.integer is not None:
+            self._set_integer(other.integer)
+        return self if other.partials is None else self._add(other.partials)
+
+    def _set_integer(self, integer):
+        # Sums stay integer only if every chunk was, whatever the order
+        self.integer = integer if self.integer is None else self.integer and integer
+
+    def _add(self, partials):
+        if self.partials is None:
+            self.partials = partials
+        else:
+            self.partials = self.partials.add(partials, fill_value=0)
+        return self
+
+    def stat(self, stat='sum'):
+        """``stat`` (sum, count or mean) of ``metric`` for every group, sorted by key."""
+        if self.partials is None:
+            raise ValueError("no rows have been added")
+        partials = self.partials.sort_index()
+        if stat == 'sum':
+            values = partials['sum']
+            if self.integer:
+                values = np.rint(values).astype(np.int64)
+        elif stat == 'count':
+            values = partials['count'].astype(np.int64)
+        elif stat == 'mean':
+            values = partials['sum'] / partials['count']
+        else:
+            raise ValueError(f"unknown statistic {stat!r}; expected one of {STATS}")
+        if not self.by:
+            values.index = values.index.get_level_values(0)
+        return values.rename(self.metric)
+
+    def top(self, k=10, stat='sum'):
+        """The ``k`` groups with the largest ``stat``, within each ``by`` partition."""
+        values = self.stat(stat)
+        if not self.by:
+            return values.nlargest(k)
+        return values.groupby(level=self.by, group_keys=False).nlargest(k)
+
+
+class TopRows:
+    """The ``k`` rows with the largest ``metric`` (per ``by`` partition).
+
+    ``columns`` are the columns to keep for the result (default: all).
+    """
+
+    def __init__(self, metric, k=20, by=None, columns=None):
+        self.metric = metric
+        self.k = k
+        self.by = by
+        self.columns = None if columns is None else list(columns)
+        self.candidates = None
+
+    def __repr__(self):
+        held = 0 if self.candidates is None else len(self.candidates)
+        return f"TopRows(metric={self.metric!r}, k={self.k}, by={self.by!r}, held={held})"
+
+    def _select(self, frame):
+        if not self.by:
+            return frame.nlargest(self.k, self.metric)
+        ranked = frame.sort_values(self.metric, ascending=False, kind='stable')
+        return ranked.groupby(self.by, sort=False).head(self.k)
+
+    def update(self, chunk):
+        """Merge the best ``k`` rows of a chunk into the candidates."""
+        if self.columns is not None:
+            chunk = chunk[self.columns]
+        best = self._select(chunk)
+        if self.candidates is not None:
+            best = self._select(pd.concat([self.candidates, best]))
+        self.candidates = best
+        return self
+
+    def merge(self, other):
+        """Merge the candidates of another TopRows (same metric and k)."""
+        if other.candidates is None:
+            return self
+        return self.update(other.candidates)
+
+    def result(self):
+        """Candidates ordered by ``metric`` (descending), per partition with ``by``."""
+        if self.candidates is None:
+            raise ValueError("no rows have been added")
+        if not self.by:
+            return self.candidates
+        return self.candidates.sort_values([self.by, self.metric], ascending=[True, False],
+                                           kind='stable')
+
+
+def top_groups(chunks, key, metric, by=None):
+    """GroupTotals of ``metric`` per ``key`` over an iterable of DataFrames."""
+    totals = GroupTotals(key, metric, by)
+    for chunk in chunks:
+        totals.update(chunk)
+    return totals
+
+
+def top_rows(chunks, metric, k=20, by=None, columns=None):
+    """The ``k`` rows with the largest ``metric`` over an iterable of DataFrames."""
+    rows = TopRows(metric, k, by, columns)
+    for chunk in chunks:
+        rows.update(chunk)
+    return rows.result()
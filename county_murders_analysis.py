@@ -8,28 +8,28 @@ Dataset: County Murders (1980-1996)
 ================================================================================
 """
 
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
-from scipy import stats
+# The steps live in county_murders/analysis.py; scikit-learn and SciPy are
+# only imported when STEP 5-7 first use them
+from county_murders import analysis
+from county_murders.data import load_raw, load_clean
+from county_murders.schema import memory_report
+from county_murders.instrument import Profiler
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style for better visualizations
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+# Per-step timing and memory, written to reports/analysis.json at the end
+# (see county_murders/instrument.py for the environment switches)
+profiler = Profiler.from_env('analysis')
 
 print("="*80)
 print("STEP 1: DATA LOADING AND EXPLORATION")
+profiler.step("STEP 1: DATA LOADING AND EXPLORATION")
 print("="*80)
 
 # Load the dataset
-url = "https://raw.githubusercontent.com/salemprakash/EDA/main/Data/countymurders.csv"
-df = pd.read_csv(url)
+# (downloaded and parsed once, then memory-mapped from an Arrow snapshot -
+#  see county_murders/data.py)
+df = load_raw()
 
 print(f"\nDataset Shape: {df.shape}")
 print(f"Number of Records: {df.shape[0]}")
@@ -45,6 +45,14 @@ print("COLUMN INFORMATION")
 print("="*80)
 print(df.info())
 
+print("\n" + "="*80)
+print("MEMORY USAGE (compact schema vs default dtypes)")
+print("="*80)
+mem = memory_report(df)
+print(f"Default 64-bit dtypes: {mem.loc['TOTAL', 'default_bytes'] / 1024**2:.2f} MB")
+print(f"Compact schema dtypes: {mem.loc['TOTAL', 'compact_bytes'] / 1024**2:.2f} MB")
+print(f"Reduction: {mem.loc['TOTAL', 'ratio']:.1f}x")
+
 print("\n" + "="*80)
 print("DESCRIPTIVE STATISTICS")
 print("="*80)
@@ -53,145 +61,125 @@ print(df.describe())
 print("\n" + "="*80)
 print("MISSING VALUES CHECK")
 print("="*80)
-missing = df.isnull().sum()
-missing_pct = (missing / len(df)) * 100
-missing_df = pd.DataFrame({'Missing Count': missing, 'Percentage': missing_pct})
-print(missing_df[missing_df['Missing Count'] > 0])
+print(analysis.missing_values(df))
 
 print("\n" + "="*80)
 print("STEP 2: DATA PREPROCESSING")
+profiler.step("STEP 2: DATA PREPROCESSING")
 print("="*80)
 
 # Handle missing values
-df_clean = df.dropna()
+# (df.dropna() is snapshotted to a memory-mapped Arrow file on the first run,
+#  built from the already loaded df)
+df_clean = load_clean(raw=df)
 print(f"Records after removing missing values: {len(df_clean)}")
 
 # Select numerical columns for analysis
-numerical_cols = df_clean.select_dtypes(include=[np.number]).columns.tolist()
+numerical_cols = analysis.numerical_columns(df_clean)
 print(f"\nNumerical columns: {len(numerical_cols)}")
 
 print("\n" + "="*80)
 print("STEP 3: EXPLORATORY DATA ANALYSIS")
+profiler.step("STEP 3: EXPLORATORY DATA ANALYSIS")
 print("="*80)
 
 # Key statistics for murders
+murder_stats = analysis.murder_statistics(df_clean)
 print("\nMURDER STATISTICS:")
-print(f"Total Murders (1980-1996): {df_clean['murders'].sum():.0f}")
-print(f"Average Murders per County: {df_clean['murders'].mean():.2f}")
-print(f"Maximum Murders in a County: {df_clean['murders'].max():.0f}")
-print(f"Counties with Zero Murders: {(df_clean['murders'] == 0).sum()}")
+print(f"Total Murders (1980-1996): {murder_stats['total']:.0f}")
+print(f"Average Murders per County: {murder_stats['mean']:.2f}")
+print(f"Maximum Murders in a County: {murder_stats['max']:.0f}")
+print(f"Counties with Zero Murders: {murder_stats['zero_count']}")
+
+# Year, state and county aggregates, one pass per key
+agg = analysis.summaries(df_clean)
 
 # Year-wise analysis
 print("\nYEAR-WISE MURDER TRENDS:")
-yearly_murders = df_clean.groupby('year')['murders'].agg(['sum', 'mean', 'std'])
+yearly_murders = analysis.yearly_trends(df_clean, agg)
 print(yearly_murders)
 
 # State-wise analysis
 print("\nSTATE-WISE ANALYSIS:")
-state_analysis = df_clean.groupby('statefips').agg({
-    'murders': 'sum',
-    'murdrate': 'mean',
-    'popul': 'mean'
-}).round(2)
+state_analysis = analysis.state_summary(df_clean, agg)
 print(state_analysis.head(10))
 
 print("\n" + "="*80)
 print("STEP 4: CORRELATION ANALYSIS")
+profiler.step("STEP 4: CORRELATION ANALYSIS")
 print("="*80)
 
-# Select key variables for correlation
-key_vars = ['murders', 'murdrate', 'arrests', 'arrestrate', 'popul', 
-            'density', 'percblack', 'rpcunemins', 'rpcpersinc']
-correlation_matrix = df_clean[key_vars].corr()
+# Correlation between the key variables (analysis.KEY_VARS), read from the
+# co-moments shared with the figure 3 heatmap
+moments = analysis.correlation_moments(df_clean)
+correlation_matrix = analysis.correlations(df_clean, moments=moments)
 print("\nCorrelation with Murder Rate:")
 print(correlation_matrix['murdrate'].sort_values(ascending=False))
 
 print("\n" + "="*80)
 print("STEP 5: K-MEANS CLUSTERING")
+profiler.step("STEP 5: K-MEANS CLUSTERING")
 print("="*80)
 
-# Prepare data for clustering
-cluster_vars = ['murdrate', 'arrestrate', 'density', 'rpcunemins', 'percblack']
-X_cluster = df_clean[cluster_vars].dropna()
-
-# Standardize the features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X_cluster)
-
-# Determine optimal number of clusters using elbow method
-inertias = []
-K_range = range(2, 11)
-for k in K_range:
-    kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-    kmeans.fit(X_scaled)
-    inertias.append(kmeans.inertia_)
-
-# Perform K-means with optimal k=4
-kmeans = KMeans(n_clusters=4, random_state=42, n_init=10)
-clusters = kmeans.fit_predict(X_scaled)
-X_cluster['Cluster'] = clusters
+# Standardize analysis.CLUSTER_VARS, run the elbow sweep over K = 2..10
+# (in parallel - see county_murders/clustering.py) and fit K-means with
+# the chosen k=4. Fitted models are shared with create_visualizations.py.
+clustering = analysis.cluster(df_clean, n_clusters=4, k_values=range(2, 11))
+X_cluster = clustering['X_cluster']
+print("\nElbow Sweep (cluster quality by K):")
+print(clustering['elbow'].round(4))
 
 print(f"\nNumber of clusters created: 4")
 print(f"\nCluster Distribution:")
 print(X_cluster['Cluster'].value_counts().sort_index())
 
 print("\nCluster Characteristics:")
-cluster_summary = X_cluster.groupby('Cluster')[cluster_vars].mean()
-print(cluster_summary)
+print(clustering['summary'])
 
 print("\n" + "="*80)
 print("STEP 6: PRINCIPAL COMPONENT ANALYSIS (PCA)")
+profiler.step("STEP 6: PRINCIPAL COMPONENT ANALYSIS (PCA)")
 print("="*80)
 
-# Prepare data for PCA
-pca_vars = ['murders', 'murdrate', 'arrests', 'arrestrate', 'popul', 
-            'density', 'percblack', 'percmale', 'rpcunemins', 'rpcpersinc']
-X_pca = df_clean[pca_vars].dropna()
-
-# Standardize
-X_pca_scaled = scaler.fit_transform(X_pca)
-
-# Apply PCA
-pca = PCA()
-pca_components = pca.fit_transform(X_pca_scaled)
+# Standardize analysis.PCA_VARS and apply PCA
+pca_result = analysis.pca_analysis(df_clean)
 
 # Explained variance
-explained_var = pca.explained_variance_ratio_
-cumulative_var = np.cumsum(explained_var)
+explained_var = pca_result['explained']
+cumulative_var = pca_result['cumulative']
 
 print(f"\nExplained Variance by Each Component:")
 for i, (var, cum_var) in enumerate(zip(explained_var[:5], cumulative_var[:5]), 1):
     print(f"PC{i}: {var*100:.2f}% (Cumulative: {cum_var*100:.2f}%)")
 
-# Get PCA loadings
-loadings = pd.DataFrame(
-    pca.components_[:3].T,
-    columns=['PC1', 'PC2', 'PC3'],
-    index=pca_vars
-)
 print("\nPrincipal Component Loadings (Top 3):")
-print(loadings)
+print(pca_result['loadings'])
 
 print("\n" + "="*80)
 print("STEP 7: STATISTICAL TESTING")
+profiler.step("STEP 7: STATISTICAL TESTING")
 print("="*80)
 
-# T-test: Compare murder rates before and after 1988
-pre_1988 = df_clean[df_clean['year'] < 1988]['murdrate']
-post_1988 = df_clean[df_clean['year'] >= 1988]['murdrate']
-
-t_stat, p_value = stats.ttest_ind(pre_1988, post_1988)
+# T-test: Compare murder rates before and after 1988, and
+# correlation test: unemployment vs murder rate
+tests = analysis.statistical_tests(df_clean, split_year=1988)
 print(f"\nT-Test: Murder Rates Before vs After 1988")
-print(f"Pre-1988 Mean: {pre_1988.mean():.4f}")
-print(f"Post-1988 Mean: {post_1988.mean():.4f}")
-print(f"T-statistic: {t_stat:.4f}")
-print(f"P-value: {p_value:.4f}")
+print(f"Pre-1988 Mean: {tests['pre_mean']:.4f}")
+print(f"Post-1988 Mean: {tests['post_mean']:.4f}")
+print(f"T-statistic: {tests['t_stat']:.4f}")
+print(f"P-value: {tests['p_value']:.4f}")
 
-# Correlation test
-corr_coef, corr_pval = stats.pearsonr(df_clean['rpcunemins'], df_clean['murdrate'])
 print(f"\nCorrelation: Unemployment vs Murder Rate")
-print(f"Correlation Coefficient: {corr_coef:.4f}")
-print(f"P-value: {corr_pval:.4f}")
+print(f"Correlation Coefficient: {tests['corr_coef']:.4f}")
+print(f"P-value: {tests['corr_pval']:.4f}")
+
+report_path = profiler.finish()
+
+print("\n" + "="*80)
+print("STEP TIMINGS")
+print("="*80)
+print(profiler.summary())
+print(f"\nRun report saved to {report_path}")
 
 print("\n" + "="*80)
 print("ANALYSIS COMPLETE!")
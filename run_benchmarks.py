@@ -0,0 +1,58 @@
+"""
+================================================================================
+SCALING BENCHMARKS - COUNTY MURDERS ANALYSIS
+Times and memory-profiles every pipeline stage on synthetic county-year
+panels of increasing size and saves the results as a JSON baseline
+================================================================================
+
+Usage:
+    python run_benchmarks.py                          # 1k, 10k, 100k, 1M rows
+    python run_benchmarks.py --sizes 1000 10000000    # custom sizes
+    python run_benchmarks.py --stages load groupby    # subset of stages
+    python run_benchmarks.py --compare benchmarks/baseline.json
+    python run_benchmarks.py --imports                # cold-start import times only
+"""
+
+import argparse
+import time
+from county_murders.benchmark import (DEFAULT_SIZES, STAGES, compare, import_times,
+                                      load_report, run_benchmarks, save_report)
+
+parser = argparse.ArgumentParser(description=__doc__.split('Usage:')[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                    help='panel sizes in rows')
+parser.add_argument('--stages', nargs='+', default=None, choices=STAGES, metavar='STAGE',
+                    help='stages to run (default: all)')
+parser.add_argument('--elbow-n-init', type=int, default=10,
+                    help='KMeans restarts per k in the elbow stage')
+parser.add_argument('--no-tracemalloc', action='store_true',
+                    help='skip peak-allocation tracing (cleaner timings)')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--output', default=f"benchmarks/results-{time.strftime('%Y%m%d-%H%M%S')}.json",
+                    help='where to write the JSON report')
+parser.add_argument('--compare', metavar='BASELINE',
+                    help='print wall-time ratios against a saved report')
+parser.add_argument('--imports', action='store_true',
+                    help='only time cold-start imports of the library vs the eager import set')
+args = parser.parse_args()
+
+if args.imports:
+    print("="*80)
+    print("COLD-START IMPORT TIMES")
+    print("="*80)
+    print(import_times().round(3))
+    raise SystemExit
+
+print("="*80)
+print("RUNNING BENCHMARKS")
+print("="*80)
+report = run_benchmarks(args.sizes, args.stages, seed=args.seed, elbow_n_init=args.elbow_n_init,
+                        trace_memory=not args.no_tracemalloc)
+print(f"\nResults saved to {save_report(report, args.output)}")
+
+if args.compare:
+    print("\n" + "="*80)
+    print(f"COMPARISON WITH {args.compare}")
+    print("="*80)
+    print(compare(load_report(args.compare), report).round(3))
@@ -0,0 +1,36 @@
+"""
+================================================================================
+SQL QUERIES RUNNER - COUNTY MURDERS ANALYSIS
+Runs the 20 queries of county_murders_queries.sql in-process (DuckDB or
+SQLite) against the cleaned dataset - no database server needed
+================================================================================
+"""
+
+import pandas as pd
+from county_murders.data import load_clean
+from county_murders.sql import run_queries
+
+pd.set_option('display.width', 120)
+
+# Load the cleaned table (same df_clean the analysis scripts use)
+df_clean = load_clean()
+
+print("="*80)
+print("RUNNING SQL QUERIES")
+print("="*80)
+
+# Query 19's INTO OUTFILE result is written to sql_output/clustering_data.csv
+results, timings = run_queries(df_clean, export_dir='sql_output')
+print(f"Engine: {timings.attrs['engine']}")
+
+for number, result in results.items():
+    print("\n" + "-"*80)
+    print(f"Query {number}: {timings.loc[number, 'title']}")
+    print("-"*80)
+    print(result.head(10) if result is not None else "(no rows)")
+
+print("\n" + "="*80)
+print("QUERY TIMINGS")
+print("="*80)
+print(timings.assign(ms=(timings['seconds'] * 1000).round(2))[['title', 'rows', 'ms']])
+print(f"\nTotal: {timings['seconds'].sum() * 1000:.1f} ms for {len(timings)} queries")
@@ -27,6 +27,12 @@ jupyter>=1.0.0
 ipython>=8.0.0
 notebook>=6.5.0
 
+# Embedded SQL engine for run_sql_queries.py (optional, falls back to sqlite3)
+duckdb>=0.9.0
+
+# Columnar snapshots of the cleaned data (optional, falls back to CSV)
+pyarrow>=10.0.0
+
 # Utilities
 openpyxl>=3.0.0  # Excel support
 xlrd>=2.0.0      # Excel reading
@@ -0,0 +1,133 @@
+"""
+Tests for the download cache in county_murders/data.py.
+
+Every test uses its own cache directory under ``tmp_path``; remote
+sources are served by a local http.server stub.
+"""
+
+import hashlib
+import http.server
+import json
+import os
+import threading
+
+import pytest
+
+from county_murders.data import cached_path
+
+CSV = b"year,murders\n1980,1\n1981,2\n"
+
+
+@pytest.fixture(autouse=True)
+def online(monkeypatch):
+    monkeypatch.delenv('COUNTY_MURDERS_OFFLINE', raising=False)
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / 'cache')
+
+
+@pytest.fixture
+def local_csv(tmp_path):
+    path = tmp_path / 'murders.csv'
+    path.write_bytes(CSV)
+    return path
+
+
+def _index(cache_dir):
+    with open(os.path.join(cache_dir, 'index.json')) as f:
+        return json.load(f)
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    body = CSV
+    etag = '"v1"'
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = http.server.HTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _url(server):
+    return f'http://127.0.0.1:{server.server_address[1]}/countymurders.csv'
+
+
+def test_file_source_is_copied_into_the_blob_store(local_csv, cache_dir):
+    path = cached_path(str(local_csv), cache_dir=cache_dir)
+    with open(path, 'rb') as f:
+        assert f.read() == CSV
+    assert os.path.basename(path) == hashlib.sha256(CSV).hexdigest() + '.csv'
+
+    entry = _index(cache_dir)['file://' + str(local_csv)]
+    assert entry['size'] == len(CSV)
+    assert entry['source_size'] == len(CSV)
+    assert entry['source_mtime_ns'] == os.stat(local_csv).st_mtime_ns
+
+    # An unchanged file is served from the cache without copying it again
+    assert cached_path(str(local_csv), cache_dir=cache_dir) == path
+    assert _index(cache_dir)['file://' + str(local_csv)]['fetched_at'] == entry['fetched_at']
+
+
+def test_local_file_edited_in_place_with_the_same_size(local_csv, cache_dir):
+    first = cached_path(str(local_csv), cache_dir=cache_dir)
+    edited = CSV.replace(b'1981,2', b'1981,7')
+    assert len(edited) == len(CSV)
+    local_csv.write_bytes(edited)
+    stat = os.stat(local_csv)
+    os.utime(local_csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = cached_path(str(local_csv), cache_dir=cache_dir, offline=True)
+    assert second != first
+    with open(second, 'rb') as f:
+        assert f.read() == edited
+
+
+def test_offline_cache_hit_and_miss(stub_server, cache_dir):
+    url = _url(stub_server)
+    with pytest.raises(FileNotFoundError):
+        cached_path(url, cache_dir=cache_dir, offline=True)
+    assert stub_server.requests == []
+
+    path = cached_path(url, cache_dir=cache_dir)
+    assert len(stub_server.requests) == 1
+    assert cached_path(url, cache_dir=cache_dir, offline=True) == path
+    assert len(stub_server.requests) == 1
+
+
+def test_refresh_revalidates_with_etag(stub_server, cache_dir):
+    url = _url(stub_server)
+    path = cached_path(url, cache_dir=cache_dir)
+    entry = _index(cache_dir)[url]
+    assert entry['etag'] == '"v1"'
+    assert 'If-None-Match' not in stub_server.requests[0]
+
+    assert cached_path(url, cache_dir=cache_dir, refresh=True) == path
+    assert stub_server.requests[1]['If-None-Match'] == '"v1"'
+    refreshed = _index(cache_dir)[url]
+    assert refreshed['fetched_at'] == entry['fetched_at']
+    assert refreshed['checked_at'] >= entry['checked_at']